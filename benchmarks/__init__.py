@@ -0,0 +1,4 @@
+# benchmarks package
+# Offline benchmarks for pripper's hot paths: a local media server, a fake
+# WebDriver over static HTML, and a generated image corpus. Run with
+# `python -m benchmarks`; see runner.py for options.
@@ -0,0 +1,123 @@
+# benchmarks/corpus.py
+import os
+import json
+import random
+import shutil
+
+MIX = (
+    ("photo", 40),      # colourful, textured
+    ("grey", 14),       # greyscale photo
+    ("small", 10),      # icon / thumbnail
+    ("text", 10),       # screenshot-like text on a flat background
+    ("qr", 4),
+    ("dup", 8),         # byte-identical copy of an earlier file
+    ("near", 7),        # same picture re-encoded at another size/format
+    ("gif", 4),
+    ("video", 3),
+)
+
+def _photo(rng, np, w, h, grey=False):
+    from PIL import Image
+    # smooth colour field plus noise: compresses like a photo, not like a flat fill
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    chans = []
+    for _ in range(3):
+        fx, fy, ph = rng.uniform(0.002, 0.02), rng.uniform(0.002, 0.02), rng.uniform(0, 6.28)
+        chans.append(127 + 100 * np.sin(xx * fx + yy * fy + ph))
+    img = np.stack(chans, axis=-1)
+    img += np.random.default_rng(rng.randrange(1 << 30)).normal(0, 12, img.shape).astype(np.float32)
+    img = Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), "RGB")
+    return img.convert("L").convert("RGB") if grey else img
+
+def _text(rng, w, h):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (w, h), (250, 250, 250))
+    d = ImageDraw.Draw(img)
+    words = ["invoice", "total", "settings", "account", "password", "download", "subscribe", "profile",
+             "notifications", "privacy", "terms", "order", "shipping", "message", "reply", "share"]
+    y = 20
+    while y < h - 20:
+        d.text((20, y), " ".join(rng.choice(words) for _ in range(8)), fill=(20, 20, 20))
+        y += 18
+    return img
+
+def _qr(rng, w):
+    from PIL import Image
+    try:
+        import cv2
+        q = cv2.QRCodeEncoder.create().encode(f"https://example.com/{rng.randrange(10**9)}")
+        img = Image.fromarray(q).convert("RGB")
+    except Exception:
+        return None
+    return img.resize((w, w), Image.NEAREST)
+
+def build_corpus(dest, n=400, seed=0):
+    """
+    Write `n` deterministic media files (image_N.ext) covering every filter's
+    case into `dest` and return {kind: count}. Rebuilding with the same
+    arguments yields the same bytes.
+    """
+    import numpy as np
+    from PIL import Image
+    rng = random.Random(seed)
+    os.makedirs(dest, exist_ok=True)
+    kinds = [k for k, _ in MIX]
+    weights = [w for _, w in MIX]
+    made = []       # (path, kind) of images that can be duplicated
+    counts = {}
+    for i in range(1, n + 1):
+        kind = rng.choices(kinds, weights)[0]
+        if kind in ("dup", "near") and not made:
+            kind = "photo"
+        base = os.path.join(dest, f"image_{i}")
+        path = None
+        if kind == "photo" or kind == "grey":
+            img = _photo(rng, np, rng.randint(500, 900), rng.randint(500, 900), grey=(kind == "grey"))
+            path = base + rng.choice((".jpg", ".jpg", ".png", ".webp"))
+            img.save(path, quality=88)
+            made.append((path, kind))
+        elif kind == "small":
+            path = base + ".png"
+            _photo(rng, np, rng.randint(40, 200), rng.randint(40, 200)).save(path)
+        elif kind == "text":
+            path = base + ".png"
+            _text(rng, rng.randint(600, 1000), rng.randint(500, 900)).save(path)
+        elif kind == "qr":
+            img = _qr(rng, rng.randint(400, 700))
+            if img is None:
+                kind = "text"
+                img = _text(rng, 700, 600)
+            path = base + ".png"
+            img.save(path)
+        elif kind == "dup":
+            src = rng.choice(made)[0]
+            path = base + os.path.splitext(src)[1]
+            shutil.copyfile(src, path)
+        elif kind == "near":
+            src = rng.choice(made)[0]
+            with Image.open(src) as im:
+                im = im.convert("RGB")
+                scale = rng.uniform(0.5, 0.8)
+                im = im.resize((max(1, int(im.width * scale)), max(1, int(im.height * scale))))
+                path = base + ".jpg"
+                im.save(path, quality=80)
+        elif kind == "gif":
+            path = base + ".gif"
+            _photo(rng, np, 320, 240).convert("P").save(path)
+        elif kind == "video":
+            path = base + ".mp4"
+            with open(path, "wb") as f:
+                f.write(b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2" + rng.randbytes(rng.randint(200_000, 900_000)))
+        counts[kind] = counts.get(kind, 0) + 1
+    with open(os.path.join(dest, ".corpus.json"), "w", encoding="utf-8") as f:
+        json.dump({"n": n, "seed": seed, "counts": counts}, f)
+    return counts
+
+def corpus_copy(cache_dir, dest, n=400, seed=0):
+    """Copy of the (cached) corpus for `n`/`seed` into `dest`, building it on first use."""
+    src = os.path.join(cache_dir, f"corpus-{n}-{seed}")
+    if not os.path.isfile(os.path.join(src, ".corpus.json")):
+        shutil.rmtree(src, ignore_errors=True)
+        build_corpus(src, n=n, seed=seed)
+    shutil.copytree(src, dest, ignore=shutil.ignore_patterns(".corpus.json"))
+    return dest
@@ -0,0 +1,160 @@
+# benchmarks/fakedriver.py
+import re
+import time
+from html.parser import HTMLParser
+
+# page segments are separated by this marker; each scroll reveals one more
+SCROLL_MARK = "<!-- scroll -->"
+
+# selenium.webdriver.common.by.By values, so callers can pass By.* unchanged
+TAG_NAME = "tag name"
+CSS_SELECTOR = "css selector"
+XPATH = "xpath"
+
+_VOID = {"img", "source", "br", "hr", "meta", "link", "input", "area", "base", "col", "embed", "track", "wbr"}
+
+class FakeElement:
+    def __init__(self, driver, tag, attrs, parent):
+        self._driver = driver
+        self.tag_name = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+
+    def get_attribute(self, name):
+        self._driver._round_trip()
+        return self.attrs.get(name)
+
+    def iter(self):
+        for child in self.children:
+            yield child
+            yield from child.iter()
+
+    def find_elements(self, by, value):
+        self._driver._round_trip()
+        if by == XPATH and value == "./..":
+            return [self.parent] if self.parent is not None else []
+        return _select(self.iter(), by, value)
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise LookupError(f"no element for {by}={value!r}")
+        return found[0]
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self, driver, root):
+        super().__init__(convert_charrefs=True)
+        self.driver = driver
+        self.stack = [root]
+
+    def handle_starttag(self, tag, attrs):
+        el = FakeElement(self.driver, tag, {k: (v if v is not None else "") for k, v in attrs}, self.stack[-1])
+        self.stack[-1].children.append(el)
+        if tag not in _VOID:
+            self.stack.append(el)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag_name == tag:
+                del self.stack[i:]
+                break
+
+_COMPOUND = re.compile(r'^([a-zA-Z0-9]*)((?:\[[^\]]+\])*)((?::not\(\[[^\]]+\]\))*)$')
+_ATTR = re.compile(r'\[([\w-]+)(?:([*^$]?=)"([^"]*)")?\]')
+
+def _attr_ok(el, cond):
+    name, op, val = cond
+    have = el.attrs.get(name)
+    if have is None:
+        return False
+    if not op:
+        return True
+    return {"=": have == val, "*=": val in have, "^=": have.startswith(val), "$=": have.endswith(val)}[op]
+
+def _select(elements, by, value):
+    if by == TAG_NAME:
+        return [e for e in elements if e.tag_name == value]
+    if by == CSS_SELECTOR:
+        # only the last compound selector is honoured (descendant context is ignored)
+        m = _COMPOUND.match(value.strip().split()[-1])
+        if not m:
+            return []
+        tag, pos, neg = m.groups()
+        need = _ATTR.findall(pos)
+        avoid = _ATTR.findall(neg)
+        return [e for e in elements
+                if (not tag or e.tag_name == tag)
+                and all(_attr_ok(e, c) for c in need)
+                and not any(_attr_ok(e, c) for c in avoid)]
+    return []
+
+class FakeDriver:
+    """
+    Stand-in for a Selenium WebDriver that serves static HTML fixtures.
+
+    `pages` maps URLs to HTML (or is one HTML string used for every URL).
+    A page is split on SCROLL_MARK and each scroll to the bottom reveals the
+    next segment, so infinite-scroll code sees pins arrive as on a real
+    board and document.body.scrollHeight stops growing at the end.
+    `round_trip` seconds are slept per driver/element call to model the
+    WebDriver protocol cost. Only the calls pripper makes are implemented.
+    """
+
+    def __init__(self, pages, round_trip=0.0, segment_height=1000):
+        self.pages = pages
+        self.round_trip = round_trip
+        self.segment_height = segment_height
+        self.calls = 0
+        self.current_url = None
+        self._segments = []
+        self._revealed = 0
+
+    def _round_trip(self):
+        self.calls += 1
+        if self.round_trip:
+            time.sleep(self.round_trip)
+
+    def get(self, url):
+        self._round_trip()
+        html = self.pages if isinstance(self.pages, str) else self.pages[url]
+        self.current_url = url
+        self._segments = []
+        for chunk in html.split(SCROLL_MARK):
+            root = FakeElement(self, "#root", {}, None)
+            builder = _TreeBuilder(self, root)
+            builder.feed(chunk)
+            builder.close()
+            self._segments.append(root)
+        self._revealed = 1
+
+    def _elements(self):
+        for root in self._segments[:self._revealed]:
+            yield from root.iter()
+
+    def execute_script(self, script, *args):
+        self._round_trip()
+        if "naturalWidth" in script or "naturalHeight" in script:
+            key = "data-natural-width" if "naturalWidth" in script else "data-natural-height"
+            return int(args[0].attrs.get(key) or 0)
+        if script.strip().startswith("return") and "scrollHeight" in script:
+            return self._revealed * self.segment_height
+        if "scrollTo" in script and "scrollHeight" in script:
+            self._revealed = min(self._revealed + 1, len(self._segments))
+        return None
+
+    def find_elements(self, by, value):
+        self._round_trip()
+        return _select(self._elements(), by, value)
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise LookupError(f"no element for {by}={value!r}")
+        return found[0]
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        self._segments = []
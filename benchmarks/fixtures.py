@@ -0,0 +1,40 @@
+# benchmarks/fixtures.py
+import random
+
+from .fakedriver import SCROLL_MARK
+from .server import media_url
+
+def board_html(base_url, pins=500, per_scroll=25, avatar_every=10, video_every=40, seed=0):
+    """
+    Static HTML for a board: `pins` pin tiles split into scroll segments of
+    `per_scroll`, with a creator avatar every `avatar_every` pins and a
+    video pin every `video_every`. Media URLs point at the MediaServer at
+    `base_url` and use the CDN's 236x size, which the scraper upgrades to 736x.
+    """
+    rng = random.Random(seed)
+    segments = []
+    tiles = []
+    for i in range(pins):
+        if video_every and i % video_every == video_every - 1:
+            tiles.append(f'<div class="pinWrapper" data-test-id="pin"><a href="/pin/{100000 + i}/">'
+                         f'<video><source src="{media_url(base_url, i, ".mp4", size="videos")}"></video></a></div>')
+        else:
+            ext = rng.choices(('.jpg', '.png', '.webp', '.gif'), (80, 8, 8, 4))[0]
+            tiles.append(f'<div class="pinWrapper" data-test-id="pin"><a href="/pin/{100000 + i}/">'
+                         f'<img src="{media_url(base_url, i, ext, size="236x")}" alt="pin {i}" width="236" height="320" '
+                         f'data-natural-width="236" data-natural-height="320"></a></div>')
+        if avatar_every and i % avatar_every == 0:
+            tiles.append(f'<div class="creator-avatar"><img class="avatar" alt="creator" width="32" height="32" '
+                         f'src="{media_url(base_url, 900000 + i, ".jpg", size="75x75_RS")}"></div>')
+        if len(tiles) >= per_scroll:
+            segments.append("\n".join(tiles))
+            tiles = []
+    if tiles:
+        segments.append("\n".join(tiles))
+    body = f"\n{SCROLL_MARK}\n".join(segments)
+    return f"<html><body><div class=\"board\">\n{body}\n</div></body></html>"
+
+def write_board(path, base_url, **kwargs):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(board_html(base_url, **kwargs))
+    return path
@@ -0,0 +1,185 @@
+# benchmarks/runner.py
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from .suites import BENCHMARKS, DEFAULTS, QUICK, NEEDS_SERVER
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    s = sorted(samples)
+    k = (len(s) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def _rss_mb(ru_maxrss):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else ru_maxrss / 1024
+
+def run_one(name, params, workdir, base_url):
+    """Run benchmark `name` in this process and return its measurements."""
+    import resource
+    import pripper.utils as utils
+    devnull = open(os.devnull, "w")
+    utils.LOG_STREAM = devnull      # keep terminal I/O out of the numbers
+    try:
+        run = BENCHMARKS[name](params, workdir, base_url)
+        self0 = resource.getrusage(resource.RUSAGE_SELF)
+        kids0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t0 = time.perf_counter()
+        out = run() or {}
+        wall = time.perf_counter() - t0
+        self1 = resource.getrusage(resource.RUSAGE_SELF)
+        kids1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    finally:
+        utils.LOG_STREAM = None
+        devnull.close()
+    cpu = ((self1.ru_utime + self1.ru_stime) - (self0.ru_utime + self0.ru_stime)
+           + (kids1.ru_utime + kids1.ru_stime) - (kids0.ru_utime + kids0.ru_stime))
+    lat = out.get("latencies") or []
+    items, nbytes = out.get("items") or 0, out.get("bytes") or 0
+    return {
+        "params": params,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_mb": round(max(_rss_mb(self1.ru_maxrss), _rss_mb(kids1.ru_maxrss)), 1),
+        "items": items,
+        "bytes": nbytes,
+        "items_per_s": round(items / wall, 2) if wall else None,
+        "mb_per_s": round(nbytes / wall / 1e6, 2) if wall else None,
+        "p50_ms": round(_percentile(lat, 0.50) * 1000, 2) if lat else None,
+        "p95_ms": round(_percentile(lat, 0.95) * 1000, 2) if lat else None,
+        "extra": out.get("extra") or {},
+    }
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                              timeout=30).stdout.strip()
+    except Exception:
+        return ""
+
+def _environment():
+    return {
+        "commit": _git("rev-parse", "HEAD") or "unknown",
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def _child(name, params, workdir, base_url):
+    """Run one benchmark in a fresh interpreter so peak RSS and CPU time are its own."""
+    cmd = [sys.executable, "-m", "benchmarks.runner", "--child", name, json.dumps(params), workdir, base_url]
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_suite(names, quick=False, latency=(0.005, 0.03), error_rate=0.02, keep=False):
+    from .server import MediaServer
+    results = {}
+    tmp = tempfile.mkdtemp(prefix="pripper-bench-")
+    server = MediaServer(latency=latency, error_rate=error_rate).start() if set(names) & NEEDS_SERVER else None
+    try:
+        for name in names:
+            params = dict(DEFAULTS[name], **(QUICK.get(name, {}) if quick else {}))
+            workdir = os.path.join(tmp, name)
+            os.makedirs(workdir)
+            print(f"  {name} ...", end="", flush=True, file=sys.stderr)
+            try:
+                res = _child(name, params, workdir, server.base_url if server else "")
+                print(f" {res['wall_s']:.2f}s", file=sys.stderr)
+            except Exception as e:
+                res = {"params": params, "error": str(e)}
+                print(f" failed: {e}", file=sys.stderr)
+            results[name] = res
+            if not keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        if server is not None:
+            server.stop()
+        if not keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+def print_table(report):
+    cols = ("wall_s", "cpu_s", "peak_rss_mb", "items_per_s", "mb_per_s", "p50_ms", "p95_ms")
+    print(f"{'benchmark':<20}" + "".join(f"{c:>13}" for c in cols))
+    for name, res in report["results"].items():
+        if "error" in res:
+            print(f"{name:<20}  error: {res['error']}")
+            continue
+        print(f"{name:<20}" + "".join(f"{'-' if res.get(c) is None else res[c]:>13}" for c in cols))
+
+def compare(old_path, new_path):
+    """Print new/old ratios for two result files (<1 wall/cpu/rss is better, >1 throughput is better)."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['env']['commit'][:10]} -> {new['env']['commit'][:10]}")
+    cols = ("wall_s", "cpu_s", "peak_rss_mb", "items_per_s", "p95_ms")
+    print(f"{'benchmark':<20}" + "".join(f"{c:>13}" for c in cols))
+    for name, res in new["results"].items():
+        prev = old["results"].get(name)
+        if not prev or "error" in res or "error" in prev:
+            continue
+        cells = []
+        for c in cols:
+            a, b = prev.get(c), res.get(c)
+            cells.append(f"{b / a:.2f}x" if a and b is not None else "-")
+        print(f"{name:<20}" + "".join(f"{x:>13}" for x in cells))
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks",
+                                description="Offline benchmarks for pripper's download, scrape and filter paths.")
+    p.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    p.add_argument("--quick", action="store_true", help="smaller inputs for a fast smoke run")
+    p.add_argument("--latency", type=float, nargs=2, default=(0.005, 0.03), metavar=("MIN", "MAX"),
+                   help="server delay per request in seconds (default: %(default)s)")
+    p.add_argument("--error-rate", type=float, default=0.02, help="share of failed responses (default: %(default)s)")
+    p.add_argument("-o", "--output", help="result file (default: benchmarks/results/<commit>.json)")
+    p.add_argument("--keep", action="store_true", help="keep the temporary working folders")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    p.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.child:
+        name, params, workdir, base_url = args.child
+        print(json.dumps(run_one(name, json.loads(params), workdir, base_url)))
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        p.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    env = _environment()
+    print(f"pripper benchmarks @ {env['commit'][:10]}{' (dirty)' if env['dirty'] else ''}", file=sys.stderr)
+    results = run_suite(names, quick=args.quick, latency=tuple(args.latency), error_rate=args.error_rate,
+                        keep=args.keep)
+    report = {"env": env, "quick": args.quick, "results": results}
+    out = args.output or os.path.join(RESULTS_DIR, f"{env['commit'][:12]}{'-dirty' if env['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_table(report)
+    print(f"\nResults written to {out}", file=sys.stderr)
+    return 1 if any("error" in r for r in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# benchmarks/server.py
+import sys
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.mp4': 'video/mp4',
+}
+
+DEFAULT_MIX = (('.jpg', 70), ('.png', 10), ('.webp', 10), ('.gif', 5), ('.mp4', 5))
+
+def media_url(base_url, i, ext='.jpg', size='736x'):
+    """A Pinterest-shaped URL for item `i` (contains 'pinimg.com', like the real CDN)."""
+    return f"{base_url}/i.pinimg.com/{size}/{i % 256:02x}/{i}{ext}"
+
+def media_urls(base_url, n, mix=DEFAULT_MIX, start=0, seed=0):
+    """`n` distinct URLs with extensions drawn from `mix` (weights)."""
+    rng = random.Random(f"{seed}:urls:{start}")
+    exts = [e for e, _ in mix]
+    weights = [w for _, w in mix]
+    return [media_url(base_url, start + i, rng.choices(exts, weights)[0]) for i in range(n)]
+
+def _header(ext, w, h):
+    """Minimal but valid leading bytes for each format (enough for pripper.imgprobe)."""
+    if ext == '.jpg':
+        app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+        sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, h, w, 1) + b'\x01\x11\x00'
+        return b'\xff\xd8' + app0 + sof0
+    if ext == '.png':
+        ihdr = struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)
+        return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr
+                + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr)))
+    if ext == '.gif':
+        return b'GIF89a' + struct.pack('<HH', w, h) + b'\x00\x00\x00'
+    if ext == '.webp':
+        return (b'RIFF' + b'\x00\x00\x00\x00' + b'WEBP' + b'VP8X' + struct.pack('<I', 10) + b'\x00' * 4
+                + (w - 1).to_bytes(3, 'little') + (h - 1).to_bytes(3, 'little'))
+    if ext == '.mp4':
+        return struct.pack('>I', 24) + b'ftypisom' + b'\x00\x00\x02\x00' + b'isomiso2'
+    return b''
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients hanging up early (cancelled downloads) are expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class MediaServer:
+    """
+    Local HTTP server handing out synthetic media for download benchmarks.
+
+    Any path ending in a known extension is served. Size, dimensions and
+    bytes are derived from the path, so a URL always returns the same
+    content and distinct URLs never collide. Payload sizes follow a
+    log-normal distribution around `size_median`; `small_fraction` of the
+    images report thumbnail dimensions (for the pre-write filters).
+    `latency` is a (min, max) delay in seconds before each response, and
+    `error_rate` is the share of requests answered with a 500 or a
+    truncated body.
+    """
+
+    def __init__(self, latency=(0.0, 0.0), size_median=150_000, size_sigma=0.6, small_fraction=0.1,
+                 error_rate=0.0, seed=0):
+        self.latency = latency
+        self.size_median = size_median
+        self.size_sigma = size_sigma
+        self.small_fraction = small_fraction
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = None
+        self.payload = lru_cache(maxsize=2048)(self._payload)
+
+    def _payload(self, path):
+        ext = path[path.rfind('.'):].lower()
+        rng = random.Random(f"{self.seed}:{path}")
+        if ext != '.mp4' and rng.random() < self.small_fraction:
+            w, h = rng.randint(48, 200), rng.randint(48, 200)
+        else:
+            w, h = rng.randint(400, 2000), rng.randint(400, 2000)
+        size = int(self.size_median * math.exp(rng.gauss(0, self.size_sigma)))
+        size = max(2_000, min(size, 20 * self.size_median))
+        head = _header(ext, w, h)
+        return head + rng.randbytes(max(0, size - len(head)))
+
+    def _decide(self):
+        with self._lock:
+            self.requests += 1
+            delay = self._rng.uniform(*self.latency) if self.latency[1] > 0 else 0.0
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return delay, fail, self._rng.random() < 0.5
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                ext = path[path.rfind('.'):].lower()
+                if ext not in CONTENT_TYPES:
+                    self.send_error(404)
+                    return
+                delay, fail, truncate = server._decide()
+                if delay:
+                    time.sleep(delay)
+                if fail and not truncate:
+                    self.send_error(500)
+                    return
+                data = server.payload(path)
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPES[ext])
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if fail:
+                    data = data[:len(data) // 2]    # promise more than we send, then hang up
+                    self.close_connection = True
+                try:
+                    for i in range(0, len(data), 65536):
+                        self.wfile.write(data[i:i + 65536])
+                except (BrokenPipeError, ConnectionResetError):
+                    return     # client cancelled (pre-write filter)
+                with server._lock:
+                    server.bytes_sent += len(data)
+
+        self._httpd = _QuietHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def urls(self, n, mix=DEFAULT_MIX, start=0):
+        return media_urls(self.base_url, n, mix=mix, start=start, seed=self.seed)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,102 @@
+# benchmarks/startup.py
+import os
+import sys
+import argparse
+import subprocess
+
+# Startup budget: each entry point is run in a fresh interpreter under
+# `-X importtime`. A check fails if its import time goes over budget or if a
+# subsystem it never uses gets imported (Selenium for a filter-only run, say).
+# Heavy modules belong inside the function that needs them.
+#
+#   python -m benchmarks.startup        (exit status 1 on any failure)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BROWSER = ("selenium", "webdriver_manager")
+IMAGING = ("cv2", "numpy", "PIL", "pytesseract")
+NETWORK = ("requests", "urllib3")
+
+_FILTER_JOB = """
+import tempfile
+from pripper.batch import run_batch_cli
+run_batch_cli(["-m", "filter", "-f", "1,2", "-o", tempfile.mkdtemp()])
+"""
+
+_IMPORT_JOB = """
+import os, tempfile
+from pripper.batch import run_batch_cli
+d = tempfile.mkdtemp()
+open(os.path.join(d, "empty.jsonl"), "w").close()
+run_batch_cli(["--import", os.path.join(d, "empty.jsonl"), "-o", os.path.join(d, "board")])
+"""
+
+# (name, code, budget in ms, modules that must not be imported)
+CHECKS = (
+    ("python -m pripper (startup)", "import pripper.__main__", 80, BROWSER + IMAGING + NETWORK),
+    ("batch CLI", "import pripper.batch", 80, BROWSER + IMAGING + NETWORK),
+    ("filter job, empty folder", _FILTER_JOB, 150, BROWSER + NETWORK),
+    ("import job, empty file", _IMPORT_JOB, 250, BROWSER + IMAGING),
+)
+
+def import_times(code):
+    """Run `code` under -X importtime; returns {module: cumulative µs} for the imports it caused
+    (nested imports are listed with 0, their time being part of their parent's)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    times = {}
+    ours = False    # skip interpreter startup (encodings, site, ...) before the first pripper import
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative = int(cumulative)
+        except ValueError:
+            continue        # header line
+        name = name[1:]     # one space after the bar, then two more per nesting level
+        if name.startswith(" "):
+            name = name.strip()
+            times.setdefault(name, 0)   # nested import: record that it happened
+            continue
+        ours = ours or name.startswith("pripper")
+        if ours:
+            times[name] = times.get(name, 0) + cumulative
+    return times
+
+def check(name, code, budget_ms, forbidden, runs=3):
+    """Best of `runs` (first runs pay for .pyc writes and cold caches)."""
+    best = None
+    for _ in range(runs):
+        times = import_times(code)
+        total = sum(times.values()) / 1000
+        best = total if best is None else min(best, total)
+    loaded = sorted({m.split(".")[0] for m in times} & set(forbidden))
+    problems = []
+    if best > budget_ms:
+        problems.append(f"{best:.0f} ms > {budget_ms} ms budget")
+    if loaded:
+        problems.append("imported " + ", ".join(loaded))
+    return best, problems
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                description="Check pripper's import-time budget and lazy loading.")
+    p.add_argument("--runs", type=int, default=3, help="runs per check, best counts (default: %(default)s)")
+    args = p.parse_args(argv)
+    failed = 0
+    print(f"{'entry point':<32}{'import ms':>10}{'budget':>8}  result")
+    for name, code, budget_ms, forbidden in CHECKS:
+        try:
+            best, problems = check(name, code, budget_ms, forbidden, runs=args.runs)
+        except RuntimeError as e:
+            best, problems = None, [f"failed: {e}"]
+        failed += bool(problems)
+        ms = "-" if best is None else f"{best:.1f}"
+        print(f"{name:<32}{ms:>10}{budget_ms:>8}  {'; '.join(problems) or 'ok'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
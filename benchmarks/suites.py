@@ -0,0 +1,155 @@
+# benchmarks/suites.py
+import os
+import time
+
+# Each benchmark is setup(params, workdir, base_url) -> run(); run() does the
+# timed work and returns a dict with any of:
+#   items, bytes      totals for throughput
+#   latencies         per-item seconds (p50/p95 are computed from these)
+#   extra             anything else worth keeping in the report
+# Setup is not timed. `base_url` points at the shared MediaServer.
+
+DEFAULTS = {
+    "download": {"urls": 300, "workers": 6},
+    "download_prefilter": {"urls": 300, "workers": 6, "min_pixels": 300},
+    "scrape": {"pins": 400, "per_scroll": 25, "round_trip": 0.0005},
+    "filters": {"files": 300, "seq": "1,2,4,3,6,7"},
+    "filters_cached": {"files": 300, "seq": "1,2,4,3,6,7"},
+    "dedupe": {"files": 300},
+    "zip": {"files": 300},
+}
+
+QUICK = {
+    "download": {"urls": 60},
+    "download_prefilter": {"urls": 60},
+    "scrape": {"pins": 100},
+    "filters": {"files": 60},
+    "filters_cached": {"files": 60},
+    "dedupe": {"files": 60},
+    "zip": {"files": 60},
+}
+
+def _timed_fetches():
+    """Wrap pripper.net._fetch_bytes to record per-download latency."""
+    import pripper.net as net
+    samples = []
+    fetch = net._fetch_bytes
+    def timed(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fetch(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - t0)
+    net._fetch_bytes = timed
+    return samples
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+def _count_media(path):
+    from pripper.files import iter_media
+    return sum(1 for _ in iter_media(path))
+
+def setup_download(params, workdir, base_url, prefilter=False):
+    from pripper.net import download_images_concurrent, min_dimensions_prefilter
+    from .server import media_urls
+    urls = media_urls(base_url, params["urls"])
+    target = os.path.join(workdir, "board")
+    prefilters = [min_dimensions_prefilter(params["min_pixels"])] if prefilter else None
+    samples = _timed_fetches()
+
+    def run():
+        count, skipped = download_images_concurrent(urls, target, set(), max_workers=params["workers"],
+                                                    prefilters=prefilters)
+        return {"items": count, "bytes": _dir_bytes(target), "latencies": samples,
+                "extra": {"skipped": skipped, "requested": len(urls)}}
+    return run
+
+def setup_download_prefilter(params, workdir, base_url):
+    return setup_download(params, workdir, base_url, prefilter=True)
+
+def setup_scrape(params, workdir, base_url):
+    import pripper.scrape as scrape
+    from .fakedriver import FakeDriver
+    from .fixtures import board_html
+    html = board_html(base_url, pins=params["pins"], per_scroll=params["per_scroll"])
+    driver = FakeDriver(html, round_trip=params["round_trip"])
+    driver.get("https://www.pinterest.com/bench/board/")
+    scrape.SCROLL_PAUSE = 0     # the real pause is wall-clock waiting for Pinterest, not our cost
+    scrape.MAX_SCROLLS = 10 ** 6
+    target = os.path.join(workdir, "board")
+    samples = _timed_fetches()
+
+    def run():
+        n = scrape.scroll_and_download_realtime(driver, target)
+        return {"items": n, "bytes": _dir_bytes(target), "latencies": samples,
+                "extra": {"driver_calls": driver.calls}}
+    return run
+
+def _setup_filters(params, workdir, cached):
+    import pripper.cache as cache
+    from pripper.filters import apply_selected_filters, parse_filter_choices
+    from .corpus import corpus_copy
+    target = corpus_copy(os.path.join(os.path.dirname(workdir), "cache"), os.path.join(workdir, "board"),
+                         n=params["files"])
+    if cached:
+        cache.ANALYSIS_CACHE_PATH = os.path.join(workdir, "analysis.sqlite")
+        warm = corpus_copy(os.path.join(os.path.dirname(workdir), "cache"), os.path.join(workdir, "warm"),
+                           n=params["files"])
+        apply_selected_filters(parse_filter_choices(params["seq"]), warm, color_mode="b")
+    else:
+        cache.ANALYSIS_CACHE_PATH = False
+    n = _count_media(target)
+    size = _dir_bytes(target)
+
+    def run():
+        apply_selected_filters(parse_filter_choices(params["seq"]), target, color_mode="b")
+        kept = sum(_count_media(os.path.join(target, d)) for d in ("color_images", "greyscale_images",
+                                                                      "videos", "gifs"))
+        return {"items": n, "bytes": size, "extra": {"kept": kept}}
+    return run
+
+def setup_filters(params, workdir, base_url):
+    return _setup_filters(params, workdir, cached=False)
+
+def setup_filters_cached(params, workdir, base_url):
+    return _setup_filters(params, workdir, cached=True)
+
+def setup_dedupe(params, workdir, base_url):
+    from pripper.files import find_duplicates, iter_media
+    from .corpus import corpus_copy
+    target = corpus_copy(os.path.join(os.path.dirname(workdir), "cache"), os.path.join(workdir, "board"),
+                         n=params["files"])
+    paths = [os.path.join(target, f) for f in iter_media(target)]
+
+    def run():
+        dups = find_duplicates(paths)
+        return {"items": len(paths), "bytes": _dir_bytes(target), "extra": {"duplicates": len(dups)}}
+    return run
+
+def setup_zip(params, workdir, base_url):
+    import shutil
+    from pripper.files import create_zip_file
+    from .corpus import corpus_copy
+    target = corpus_copy(os.path.join(os.path.dirname(workdir), "cache"), os.path.join(workdir, "board"),
+                         n=params["files"])
+    extra_src = sorted(os.listdir(target))[:5]
+
+    def run():
+        t0 = time.perf_counter()
+        create_zip_file(target)
+        full = time.perf_counter() - t0
+        for i, f in enumerate(extra_src):
+            shutil.copyfile(os.path.join(target, f), os.path.join(target, f"extra_{i}_{f}"))
+        t0 = time.perf_counter()
+        create_zip_file(target)
+        return {"items": _count_media(target), "bytes": _dir_bytes(target),
+                "extra": {"full_s": round(full, 4), "append5_s": round(time.perf_counter() - t0, 4)}}
+    return run
+
+BENCHMARKS = {name: globals()[f"setup_{name}"] for name in DEFAULTS}
+NEEDS_SERVER = {"download", "download_prefilter", "scrape"}
@@ -1,5 +1,6 @@
 # pinterest_ripper.py
+import sys
 from pripper.cli import main
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -7,5 +7,15 @@ __all__ = [
     "files",
     "scrape",
     "filters",
+    "analysis",
+    "cache",
+    "phash",
+    "imgprobe",
     "cli",
+    "batch",
+    "export",
+    "workqueue",
+    "store",
+    "metrics",
+    "progress",
 ]
@@ -0,0 +1,6 @@
+# pripper/__main__.py
+import sys
+from .cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,456 @@
+# pripper/analysis.py
+import os
+import functools
+
+from .config import FILTER_WORKERS
+
+# Features an image can be analysed for. 'dims' comes from the file header;
+# the rest share one decode of the image. 'qr' looks at the TEXT_SIZE copy,
+# 'qr_full' at full resolution; 'qr_full' and 'ocr' disable draft decoding.
+DECODE_FEATURES = ("qr", "text", "qr_full", "ocr", "colour", "dhash")
+FEATURES = ("dims",) + DECODE_FEATURES
+_FULL_RES = {"qr_full", "ocr"}
+
+# result key each feature fills in, and the value used when it can't be computed
+_KEYS = {"dims": "width", "qr": "qr", "text": "text_score", "qr_full": "qr_full",
+         "ocr": "ocr_letters", "colour": "colour", "dhash": "dhash"}
+_DEFAULTS = {"qr": False, "text_score": 0.0, "qr_full": False, "ocr_letters": None, "colour": None,
+             "dhash": None}
+
+TEXT_SIZE   = 900   # long side used for the text-likeness score
+COLOUR_SIZE = 256   # thumbnail used for colour statistics
+SAT_LOW     = 0.22  # pixel counts as low-saturation if S < SAT_LOW
+
+# Bump when a kernel changes what it measures; cached results from other
+# versions are then ignored.
+ANALYZER_VERSION = f"2:text{TEXT_SIZE}:colour{COLOUR_SIZE}:sat{SAT_LOW}"
+
+# --------- Per-feature kernels (work on an already-decoded image) ----------
+def _has_qr(bgr):
+    """True if a QR is detected (OpenCV)."""
+    try:
+        import cv2
+        det = cv2.QRCodeDetector()
+        data, pts, _ = det.detectAndDecode(bgr)
+        return bool(pts is not None and pts.any())
+    except Exception:
+        return False
+
+def _ocr_letters(img):
+    """Return alnum char count via pytesseract, or None if unavailable."""
+    try:
+        import pytesseract
+        txt = pytesseract.image_to_string(img)
+        return sum(ch.isalnum() for ch in txt)
+    except Exception:
+        return None
+
+OCR_BATCH = 64  # images per Tesseract invocation
+
+def _ocr_chunk(paths):
+    """OCR many files in one Tesseract run (list-file input, pages split on form feeds)."""
+    import tempfile
+    import pytesseract
+    fd, listfile = tempfile.mkstemp(suffix=".txt", prefix="pripper_ocr_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(os.path.abspath(p) for p in paths) + "\n")
+        pages = pytesseract.image_to_string(listfile).split("\f")
+    finally:
+        try:
+            os.remove(listfile)
+        except OSError:
+            pass
+    if pages and not pages[-1].strip():
+        pages = pages[:-1]
+    if len(pages) != len(paths):
+        raise ValueError(f"expected {len(paths)} OCR pages, got {len(pages)}")
+    return [sum(ch.isalnum() for ch in txt) for txt in pages]
+
+def ocr_letters_batch(paths, batch=OCR_BATCH, workers=None):
+    """
+    Alnum counts for many files using as few Tesseract processes as possible:
+    one per `batch` files, chunks running side by side. A chunk whose output
+    can't be matched to its inputs (e.g. an unreadable file) falls back to
+    one call per file. Returns None per file when OCR is unavailable.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    try:
+        import pytesseract  # noqa: F401
+    except ImportError:
+        return [None] * len(paths)
+    import concurrent.futures
+
+    def run(chunk):
+        try:
+            return _ocr_chunk(chunk)
+        except Exception:
+            from PIL import Image
+            out = []
+            for p in chunk:
+                try:
+                    with Image.open(p) as im:
+                        out.append(_ocr_letters(im))
+                except Exception:
+                    out.append(None)
+            return out
+
+    chunks = [paths[i:i + batch] for i in range(0, len(paths), batch)]
+    workers = min(len(chunks), workers or FILTER_WORKERS or os.cpu_count() or 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        return [n for counts in ex.map(run, chunks) for n in counts]
+
+def _dhash(img):
+    """64-bit difference hash (hex): brightness gradients of a 9x8 greyscale copy.
+    Survives re-encoding, resizing and format changes."""
+    from PIL import Image
+    small = img.convert('L').resize((9, 8), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+def _downscale(bgr, resize_to):
+    """Shrink so the long side is at most `resize_to` (INTER_AREA)."""
+    import cv2
+    h, w = bgr.shape[:2]
+    s = min(1.0, float(resize_to) / max(h, w)) if max(h, w) > resize_to else 1.0
+    if s < 1.0:
+        return cv2.resize(bgr, (int(w*s), int(h*s)), interpolation=cv2.INTER_AREA)
+    return bgr
+
+def _textlike_score(bgr, resize_to=TEXT_SIZE):
+    """
+    Heuristic score (0..1) for 'text/screenshot-like' using OpenCV only:
+    combines edge density + many small components + large white background.
+    """
+    try:
+        import cv2, numpy as np
+        img = _downscale(bgr, resize_to)
+
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(cv2.GaussianBlur(gray, (3,3), 0), 80, 160)
+        edge_density = float((edges > 0).mean())
+
+        thr = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY_INV, 25, 10)
+        kernel = np.ones((3,3), np.uint8)
+        opened = cv2.morphologyEx(thr, cv2.MORPH_OPEN, kernel, iterations=1)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(opened, 8)
+        areas = stats[1:, cv2.CC_STAT_AREA].astype(np.float32) if n > 1 else np.array([])
+        img_area = float(opened.shape[0] * opened.shape[1])
+        small = ((areas > img_area*0.0002) & (areas < img_area*0.02)).sum()
+        small_ratio = small / max(len(areas), 1)
+
+        white_bg_ratio = float((gray >= 240).mean())
+        score = 0.45*small_ratio + 0.35*edge_density + 0.20*white_bg_ratio
+        return max(0.0, min(1.0, float(score)))
+    except Exception:
+        return 0.0
+
+_SRGB_LUT = None
+
+def _srgb_to_linear_lut():
+    """256-entry sRGB -> linear-light table (built once)."""
+    global _SRGB_LUT
+    if _SRGB_LUT is None:
+        import numpy as np
+        c = np.arange(256, dtype=np.float32) / 255.0
+        _SRGB_LUT = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4).astype(np.float32)
+    return _SRGB_LUT
+
+def _lab_f(t):
+    import numpy as np
+    return np.where(t > 0.008856, np.cbrt(t), 7.787 * t + 16.0 / 116.0)
+
+def colour_metrics_batch(thumbs, sat_low=SAT_LOW):
+    """
+    Colour statistics for many RGB thumbnails (HxWx3 uint8 arrays or PIL
+    images) in one vectorised pass; returns one dict per thumbnail:
+      frac_low     - share of mid-tone pixels (20 <= V <= 245) with saturation < sat_low
+      p90          - 90th percentile of that saturation (0..1)
+      colorfulness - Hasler–Süsstrunk colourfulness
+      chroma_mean  - mean CIE LAB chroma (D65)
+    All thumbnails are flattened into one pixel buffer with a segment id per
+    pixel, so per-image reductions are bincounts rather than Python loops.
+    """
+    import numpy as np
+    arrs = [np.asarray(t, dtype=np.uint8).reshape(-1, 3) for t in thumbs]
+    n = len(arrs)
+    if n == 0:
+        return []
+    sizes = np.array([len(a) for a in arrs], dtype=np.int64)
+    px = np.concatenate(arrs)
+    seg = np.repeat(np.arange(n), sizes)
+    cnt = sizes.astype(np.float64)
+
+    # HSV saturation/value as Pillow defines them: S = (max-min)/max, V = max
+    mx = px.max(axis=1)
+    mn = px.min(axis=1)
+    sat = (mx - mn).astype(np.float32) / np.maximum(mx, 1).astype(np.float32)
+    mid = (mx >= 20) & (mx <= 245)
+    mid_cnt = np.bincount(seg, weights=mid, minlength=n)
+    use = mid | (mid_cnt == 0)[seg]     # images with no mid-tones fall back to all pixels
+    use_cnt = np.bincount(seg, weights=use, minlength=n)
+    frac_low = np.bincount(seg, weights=use & (sat < sat_low), minlength=n) / np.maximum(use_cnt, 1)
+
+    # 90th percentile per image: sort (segment, saturation) once, then index each segment
+    s_used, seg_used = sat[use], seg[use]
+    s_sorted = s_used[np.lexsort((s_used, seg_used))]
+    counts = np.bincount(seg_used, minlength=n)
+    offs = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    k = 0.9 * np.maximum(counts - 1, 0)
+    lo = np.floor(k).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(counts - 1, 0))
+    p90 = s_sorted[offs + lo] + (k - lo) * (s_sorted[offs + hi] - s_sorted[offs + lo])
+
+    # Hasler–Süsstrunk colourfulness
+    rgb = px.astype(np.float32)
+    rg = rgb[:, 0] - rgb[:, 1]
+    yb = 0.5 * (rgb[:, 0] + rgb[:, 1]) - rgb[:, 2]
+    m_rg = np.bincount(seg, weights=rg, minlength=n) / cnt
+    m_yb = np.bincount(seg, weights=yb, minlength=n) / cnt
+    d_rg = rg - m_rg[seg].astype(np.float32)
+    d_yb = yb - m_yb[seg].astype(np.float32)
+    var = (np.bincount(seg, weights=d_rg * d_rg, minlength=n)
+           + np.bincount(seg, weights=d_yb * d_yb, minlength=n)) / cnt
+    colorfulness = np.sqrt(var) + 0.3 * np.sqrt(m_rg * m_rg + m_yb * m_yb)
+
+    # LAB chroma: sRGB -> linear (table lookup) -> XYZ -> a*, b*
+    lin = _srgb_to_linear_lut()[px]
+    r, g, b = lin[:, 0], lin[:, 1], lin[:, 2]
+    fx = _lab_f((0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047)
+    fy = _lab_f(0.2126 * r + 0.7152 * g + 0.0722 * b)
+    fz = _lab_f((0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883)
+    a_star = 500.0 * (fx - fy)
+    b_star = 200.0 * (fy - fz)
+    chroma_mean = np.bincount(seg, weights=np.sqrt(a_star * a_star + b_star * b_star), minlength=n) / cnt
+
+    return [
+        {"frac_low": float(frac_low[i]), "p90": float(p90[i]),
+         "colorfulness": float(colorfulness[i]), "chroma_mean": float(chroma_mean[i])}
+        for i in range(n)
+    ]
+
+def colour_metrics(thumb, sat_low=SAT_LOW):
+    """Colour statistics for a single thumbnail (see colour_metrics_batch)."""
+    return colour_metrics_batch([thumb], sat_low)[0]
+
+# --------- Decode-once engine ----------
+def analyze_image(path, features, sat_low=SAT_LOW):
+    """
+    Compute the requested `features` for one image with a single decode.
+    Dimensions come from the header; unless a full-resolution feature
+    (qr_full, ocr) is asked for, JPEGs are decoded at reduced size (draft
+    mode) since the other features only look at a downscaled copy anyway. Failed features get neutral
+    defaults (no QR, score 0, OCR/colour None); an unreadable file also
+    sets 'error'.
+    """
+    want = [f for f in DECODE_FEATURES if f in features]
+    res = {}
+    try:
+        from PIL import Image, ImageFile
+        ImageFile.LOAD_TRUNCATED_IMAGES = True
+        with Image.open(path) as im:
+            res["width"], res["height"] = im.size
+            if not want:
+                return res
+            if not (_FULL_RES & set(want)):
+                need = TEXT_SIZE if {"qr", "text"} & set(want) else COLOUR_SIZE
+                try:
+                    im.draft('RGB', (need, need))
+                except Exception:
+                    pass
+            rgb = im.convert('RGB')
+    except Exception as e:
+        res["error"] = str(e)
+        res.setdefault("width", None)
+        res.setdefault("height", None)
+        for f in want:
+            res[_KEYS[f]] = _DEFAULTS[_KEYS[f]]
+        return res
+
+    if {"qr", "text", "qr_full"} & set(want):
+        try:
+            import numpy as np
+            bgr = np.ascontiguousarray(np.asarray(rgb)[:, :, ::-1])
+            small = _downscale(bgr, TEXT_SIZE)
+        except Exception:
+            bgr = small = None
+        if "qr" in want:
+            res["qr"] = _has_qr(small) if small is not None else False
+        if "text" in want:
+            res["text_score"] = _textlike_score(small) if small is not None else 0.0
+        if "qr_full" in want:
+            res["qr_full"] = _has_qr(bgr) if bgr is not None else False
+    if "ocr" in want:
+        res["ocr_letters"] = _ocr_letters(rgb)
+    if "dhash" in want:
+        try:
+            res["dhash"] = _dhash(rgb)
+        except Exception:
+            res["dhash"] = None
+    if "colour" in want:
+        try:
+            from PIL import Image
+            thumb = rgb.copy()
+            thumb.thumbnail((COLOUR_SIZE, COLOUR_SIZE), Image.BILINEAR)
+            res["colour"] = colour_metrics(thumb, sat_low)
+        except Exception:
+            res["colour"] = None
+    return res
+
+# --------- Parallel execution ----------
+def _digest(path):
+    from .files import sha256_file
+    try:
+        return sha256_file(path)
+    except Exception:
+        return None
+
+def parallel_map(fn, items, workers=None, min_parallel=8):
+    """
+    Map a picklable top-level `fn` over `items` in a process pool, in chunks
+    (several per worker, so stragglers even out). Small inputs, a single
+    worker, or a pool that can't start all fall back to a plain loop.
+    Results come back in input order.
+    """
+    items = list(items)
+    workers = workers or FILTER_WORKERS or os.cpu_count() or 1
+    if workers <= 1 or len(items) < min_parallel:
+        return [fn(x) for x in items]
+    import concurrent.futures
+    workers = min(workers, len(items))
+    chunksize = max(1, len(items) // (workers * 4))
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(fn, items, chunksize=chunksize))
+    except (OSError, concurrent.futures.process.BrokenProcessPool) as e:
+        from .utils import print_warning
+        print_warning(f"Process pool unavailable ({e}); analysing serially.")
+        return [fn(x) for x in items]
+
+class ImageAnalyzer:
+    """
+    Per-run feature store for the files in `target_dir`. The first time a
+    decode-based feature is needed for a file, every decode feature in
+    `features` is computed from that one decode, so later filters in the
+    same run only read results. 'dims' alone never triggers a decode.
+
+    With a `cache` (cache.FeatureCache), decode features are first looked up
+    by content hash, and fresh results are written back, so files analysed
+    in earlier runs cost a hash and a lookup instead of a decode.
+    """
+
+    def __init__(self, target_dir, features=FEATURES, workers=None, cache=None):
+        self.target_dir = target_dir
+        self.features = set(features)
+        self.workers = workers
+        self.cache = cache
+        self.results = {}
+        self.digests = {}
+
+    def _pending(self, feature):
+        return tuple(f for f in DECODE_FEATURES if f in self.features or f == feature)
+
+    def get(self, filename, feature):
+        res = self.results.setdefault(filename, {})
+        if _KEYS[feature] in res:
+            return res
+        path = os.path.join(self.target_dir, filename)
+        if feature == "dims":
+            res.update(analyze_image(path, ()))
+            return res
+        if self.cache is not None:
+            self._load_cached([filename], [path])
+            if _KEYS[feature] in res:
+                return res
+        res.update(analyze_image(path, [f for f in self._pending(feature) if _KEYS[f] not in res]))
+        self._store([filename])
+        return res
+
+    def _load_cached(self, filenames, paths):
+        """Hash `filenames` (in the pool) and merge any cached results."""
+        todo = [(f, p) for f, p in zip(filenames, paths) if f not in self.digests]
+        if todo:
+            digests = parallel_map(_digest, [p for _, p in todo], workers=self.workers)
+            for (f, _), d in zip(todo, digests):
+                self.digests[f] = d
+        cached = self.cache.get_many([self.digests[f] for f in filenames])
+        for f in filenames:
+            hit = cached.get(self.digests[f])
+            if hit:
+                for k, v in hit.items():
+                    self.results.setdefault(f, {}).setdefault(k, v)
+
+    def _store(self, filenames):
+        if self.cache is None:
+            return
+        items = {}
+        for f in filenames:
+            if self.digests.get(f):
+                # OCR None means Tesseract was unavailable; leave it to be retried
+                items[self.digests[f]] = {k: v for k, v in self.results[f].items()
+                                          if not (k == "ocr_letters" and v is None)}
+        self.cache.put_many(items)
+
+    def ocr(self, filenames):
+        """Fill in OCR letter counts for `filenames` with batched Tesseract runs."""
+        todo = [f for f in filenames if "ocr_letters" not in self.results.get(f, {})]
+        if todo and self.cache is not None:
+            self._load_cached(todo, [os.path.join(self.target_dir, f) for f in todo])
+            todo = [f for f in todo if "ocr_letters" not in self.results.get(f, {})]
+        if not todo:
+            return
+        counts = ocr_letters_batch([os.path.join(self.target_dir, f) for f in todo], workers=self.workers)
+        for f, n in zip(todo, counts):
+            self.results.setdefault(f, {})["ocr_letters"] = n
+        # a None means OCR was unavailable, not that the image has no text; don't persist it
+        self._store([f for f, n in zip(todo, counts) if n is not None])
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def prefetch(self, filenames, feature):
+        """Compute `feature` (plus the run's other decode features) for many
+        files at once in a process pool; later get() calls are lookups."""
+        key = _KEYS[feature]
+        todo = [f for f in filenames if key not in self.results.get(f, {})]
+        if not todo:
+            return
+        if feature == "dims":
+            for f in todo:
+                self.get(f, "dims")     # header read only; not worth a process hop
+            return
+        if self.cache is not None:
+            self._load_cached(todo, [os.path.join(self.target_dir, f) for f in todo])
+            todo = [f for f in todo if key not in self.results.get(f, {})]
+            if not todo:
+                return
+        # only what some file still lacks (e.g. a full-res QR recheck doesn't redo the text score)
+        pending = tuple(p for p in self._pending(feature)
+                        if any(_KEYS[p] not in self.results.get(f, {}) for f in todo))
+        paths = [os.path.join(self.target_dir, f) for f in todo]
+        fn = functools.partial(analyze_image, features=pending)
+        for f, res in zip(todo, parallel_map(fn, paths, workers=self.workers)):
+            self.results.setdefault(f, {}).update(res)
+        self._store(todo)
+
+def features_for(seq):
+    """Features needed by a filter sequence like ['1', '4', '3']."""
+    need = set()
+    if "1" in seq:
+        need.add("dims")
+    if "3" in seq:
+        need.add("colour")
+    if "4" in seq:
+        need.update(("qr", "text"))     # qr_full / ocr only run for cascade candidates
+    if "7" in seq:
+        need.add("dhash")
+    return need
@@ -0,0 +1,327 @@
+# pripper/batch.py
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import concurrent.futures
+
+from .utils import print_info, print_success, print_warning, print_error, log_to_stderr
+from .config import MAX_WORKERS, MIN_IMAGE_PIXELS, CONTENT_STORE, METRICS_REPORT, METRICS_PROM, VERBOSE_LOG
+from . import metrics, progress
+
+MODES = ("basic", "advanced", "filter", "import")
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog="pripper",
+        description="Non-interactive Pinterest ripper: rip many boards from flags or a JSONL jobs file.",
+    )
+    p.add_argument("urls", nargs="*", help="Pinterest URLs to rip (all use the flags below)")
+    p.add_argument("--jobs", metavar="FILE",
+                   help="JSONL jobs file; one object per line with url, target, mode, filters, color_mode, zip, sharded")
+    p.add_argument("-o", "--target", default="pinterest_downloads",
+                   help="default target directory (default: %(default)s)")
+    p.add_argument("-m", "--mode", choices=MODES, default="basic",
+                   help="default mode; 'filter' runs filters on the target without a browser")
+    p.add_argument("--export", metavar="FILE",
+                   help="discovery only: stream found media as JSONL to FILE ('-' = stdout) instead of downloading")
+    p.add_argument("--import", dest="import_file", metavar="FILE",
+                   help="download every URL in an export JSONL file into the target (no browser)")
+    p.add_argument("-f", "--filters", default="",
+                   help="filters to run after each job, e.g. '1,2,4' or '5' for everything")
+    p.add_argument("--color-mode", choices=("b", "c", "g"), default="b",
+                   help="colour sort mode for filter 3 (default: %(default)s)")
+    p.add_argument("--min-pixels", type=int, default=None,
+                   help="cancel downloads whose header shows a side below N px "
+                        "(default: on at %d when filter 1 is selected; 0 = off)" % MIN_IMAGE_PIXELS)
+    p.add_argument("--zip", action="store_true", help="create a ZIP of the target after each job")
+    p.add_argument("--dry-run", action="store_true",
+                   help="filters only report what they would delete and move (see --log for every file)")
+    p.add_argument("--sharded", action="store_true",
+                   help="store files in 000/, 001/, … subfolders of SHARD_SIZE each (for very large targets)")
+    p.add_argument("--store", metavar="DIR", default=CONTENT_STORE,
+                   help="keep media once in a shared content store; boards get hardlinks, known URLs aren't refetched")
+    p.add_argument("--store-gc", action="store_true",
+                   help="delete store blobs that no board links to any more, then exit")
+    p.add_argument("--migrate-shards", metavar="DIR",
+                   help="convert an existing flat download folder to the sharded layout and exit")
+    p.add_argument("--visible", action="store_true", help="show the browser window (default: headless)")
+    p.add_argument("--normal", action="store_true", help="normal page-load strategy instead of fast")
+    p.add_argument("--coordinator", metavar="QUEUE",
+                   help="distributed crawl: discover work for the jobs and put it in the SQLite queue file QUEUE")
+    p.add_argument("--worker", metavar="QUEUE",
+                   help="distributed crawl: claim and process items from QUEUE until it drains")
+    p.add_argument("--worker-id", help="worker name in the queue (default: host:pid)")
+    p.add_argument("--lease", type=int, default=300, help="seconds a claimed item stays leased (default: %(default)s)")
+    p.add_argument("-j", "--concurrency", type=int, default=2,
+                   help="boards processed at the same time (default: %(default)s)")
+    p.add_argument("--download-budget", type=int, default=MAX_WORKERS * 2,
+                   help="max in-flight downloads across all jobs (default: %(default)s)")
+    p.add_argument("--summary", default="-", metavar="FILE",
+                   help="write one JSON summary line per job here ('-' = stdout, default)")
+    p.add_argument("--metrics", metavar="FILE", default=METRICS_REPORT,
+                   help="write per-stage counters, latency histograms and per-item traces to this JSON file")
+    p.add_argument("--metrics-prom", metavar="FILE", default=METRICS_PROM,
+                   help="write counters and histograms in Prometheus textfile format to FILE at exit")
+    p.add_argument("--log", metavar="FILE", default=VERBOSE_LOG,
+                   help="append per-file detail (each download, deletion and move) to FILE; "
+                        "the terminal only shows progress lines")
+    return p
+
+def load_jobs(args):
+    """Merge positional URLs and the jobs file into a list of job dicts with defaults filled in."""
+    defaults = {
+        "target": args.target,
+        "mode": args.mode,
+        "filters": args.filters,
+        "color_mode": args.color_mode,
+        "zip": args.zip,
+        "dry_run": args.dry_run,
+        "sharded": args.sharded,
+        "store": args.store,
+        "export": args.export,
+        "min_pixels": args.min_pixels,
+    }
+    jobs = [dict(defaults, url=u) for u in args.urls]
+    if args.import_file:
+        jobs.append(dict(defaults, mode="import", input=args.import_file, export=None))
+    if args.jobs:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    obj = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{args.jobs}:{lineno}: invalid JSON ({e})")
+                if not isinstance(obj, dict):
+                    raise ValueError(f"{args.jobs}:{lineno}: expected a JSON object")
+                jobs.append(dict(defaults, **obj))
+    if args.mode == "filter" and not jobs:
+        jobs.append(dict(defaults, url=None))
+
+    for i, job in enumerate(jobs):
+        job["id"] = job.get("id", i)
+        job["mode"] = (job.get("mode") or "basic").lower()
+        if job["mode"] not in MODES:
+            raise ValueError(f"job {job['id']}: unknown mode '{job['mode']}'")
+        if job["mode"] == "import":
+            if not job.get("input"):
+                raise ValueError(f"job {job['id']}: import needs an 'input' file")
+        elif job["mode"] != "filter" and not job.get("url"):
+            raise ValueError(f"job {job['id']}: missing url")
+    return jobs
+
+def job_prefilters(job):
+    """Pre-write filters for a job: the small-image rule moves to download time when filter 1 is requested."""
+    from .filters import parse_filter_choices
+    from .net import min_dimensions_prefilter
+    min_pixels = job.get("min_pixels")
+    if min_pixels is None:
+        min_pixels = MIN_IMAGE_PIXELS if "1" in parse_filter_choices(job.get("filters")) else 0
+    return [min_dimensions_prefilter(min_pixels)] if min_pixels else None
+
+def run_job(job, budget, headless=True, fast=True, exporter=None):
+    """Run a single job and return its summary dict. Never raises.
+
+    With an `exporter`, basic/advanced jobs only discover media and stream it
+    out; nothing is downloaded, filtered or zipped.
+    """
+    from .filters import filter_downloaded_images
+    from .files import create_zip_file
+
+    target = job["target"]
+    summary = {
+        "id": job["id"],
+        "url": job.get("url"),
+        "target": target,
+        "mode": job["mode"],
+        "status": "ok",
+        "found": None,
+        "downloaded": 0,
+        "skipped": None,
+        "filters": job.get("filters") or "",
+        "seconds": 0.0,
+    }
+    t0 = time.time()
+    driver = None
+    try:
+        prefilters = job_prefilters(job)
+        from .store import open_store
+        store = open_store(job.get("store"))
+        if exporter is None:
+            os.makedirs(target, exist_ok=True)
+            if job.get("sharded"):
+                from .files import enable_sharding
+                enable_sharding(target)
+        if job["mode"] == "import":
+            from .export import import_export_file
+            summary["downloaded"], summary["skipped"] = import_export_file(
+                job["input"], target, budget=budget, prefilters=prefilters, store=store)
+        elif job["mode"] != "filter":
+            from .browser import get_driver
+            print_info(f"[job {job['id']}] {job['mode']}: {job['url']} -> {target}")
+            driver = get_driver(headless=headless, fast=fast)
+            driver.get(job["url"])
+            time.sleep(2.0 if fast else 3.0)
+
+            if job["mode"] == "advanced":
+                from .scrape import extract_image_urls_advanced
+                urls = extract_image_urls_advanced(driver, job["url"], exporter=exporter)
+                summary["found"] = len(urls)
+                if urls and exporter is None:
+                    from .net import download_to_dir
+                    summary["downloaded"], summary["skipped"] = download_to_dir(
+                        urls, target, budget=budget, prefilters=prefilters, store=store)
+            else:
+                from .scrape import scroll_and_download_realtime
+                n = scroll_and_download_realtime(driver, target, budget=budget, exporter=exporter,
+                                                 prefilters=prefilters, store=store)
+                summary["found" if exporter is not None else "downloaded"] = n
+
+        if exporter is None and job.get("filters"):
+            plan = filter_downloaded_images(target, choices=job["filters"], color_mode=job.get("color_mode") or "b",
+                                            dry_run=bool(job.get("dry_run")))
+            if plan is not None:
+                counts = plan.counts()
+                summary["filtered"] = {
+                    "deleted": sum(n for (action, _), n in counts.items() if action == "delete"),
+                    "moved": sum(n for (action, _), n in counts.items() if action == "move"),
+                    "dry_run": bool(job.get("dry_run")),
+                }
+        if exporter is None and job.get("zip") and not job.get("dry_run") \
+                and (summary["downloaded"] or job["mode"] == "filter"):
+            create_zip_file(target)
+    except Exception as e:
+        summary["status"] = "error"
+        summary["error"] = str(e)
+        print_error(f"[job {job['id']}] failed: {e}")
+    finally:
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+    summary["seconds"] = round(time.time() - t0, 3)
+    return summary
+
+def run_jobs(jobs, concurrency=2, download_budget=MAX_WORKERS * 2, headless=True, fast=True, on_summary=None):
+    """
+    Run jobs with up to `concurrency` boards in flight. Jobs sharing a target
+    directory run one after another (filenames are numbered per directory);
+    distinct targets run in parallel. Returns summaries in job order.
+    """
+    from .export import JsonlExporter
+
+    budget = threading.BoundedSemaphore(max(1, download_budget))
+    # one exporter per output path, shared by every job writing there
+    exporters = {}
+    for job in jobs:
+        path = job.get("export")
+        if path and job["mode"] in ("basic", "advanced") and path not in exporters:
+            exporters[path] = JsonlExporter(path)
+    groups = {}
+    for pos, job in enumerate(jobs):
+        groups.setdefault(os.path.abspath(job["target"]), []).append((pos, job))
+
+    lock = threading.Lock()
+    summaries = [None] * len(jobs)
+
+    def run_group(group):
+        for pos, job in group:
+            exporter = exporters.get(job.get("export")) if job["mode"] in ("basic", "advanced") else None
+            s = run_job(job, budget, headless=headless, fast=fast, exporter=exporter)
+            with lock:
+                summaries[pos] = s
+                if on_summary:
+                    on_summary(s)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+            for fut in [ex.submit(run_group, g) for g in groups.values()]:
+                fut.result()
+    finally:
+        for exporter in exporters.values():
+            exporter.close()
+    return summaries
+
+def run_batch_cli(argv=None):
+    """Entry point for `python -m pripper <args>`. Returns a process exit code."""
+    args = build_parser().parse_args(argv)
+    if args.metrics or args.metrics_prom:
+        metrics.enable(args.metrics, args.metrics_prom)
+    progress.set_log(args.log)
+    try:
+        return _run(args)
+    finally:
+        metrics.finish()
+        progress.close_log()
+
+def _run(args):
+    if args.migrate_shards:
+        from .files import migrate_to_shards
+        if not os.path.isdir(args.migrate_shards):
+            print_error(f"Not a directory: {args.migrate_shards}")
+            return 2
+        migrate_to_shards(args.migrate_shards)
+        return 0
+    if args.store_gc:
+        from .store import open_store
+        if not args.store:
+            print_error("--store-gc needs --store DIR (or CONTENT_STORE in config).")
+            return 2
+        removed, freed = open_store(args.store).gc()
+        print_success(f"Store GC: removed {removed} unreferenced blobs ({freed / 1e6:.1f} MB).")
+        return 0
+    if args.worker:
+        from .workqueue import run_worker
+        from .net import min_dimensions_prefilter
+        run_worker(args.worker, owner=args.worker_id, batch=max(1, args.download_budget), lease=args.lease,
+                   headless=not args.visible, fast=not args.normal, store=args.store,
+                   prefilters=[min_dimensions_prefilter(args.min_pixels)] if args.min_pixels else None)
+        return 0
+    try:
+        jobs = load_jobs(args)
+    except (OSError, ValueError) as e:
+        print_error(str(e))
+        return 2
+    if not jobs:
+        print_warning("No jobs given (pass URLs or --jobs FILE).")
+        return 2
+
+    if args.coordinator:
+        from .workqueue import run_coordinator
+        crawl = [j for j in jobs if j["mode"] in ("basic", "advanced")]
+        run_coordinator(args.coordinator, crawl, headless=not args.visible, fast=not args.normal)
+        return 0
+
+    to_stdout = any(job.get("export") == "-" for job in jobs)
+    if to_stdout or args.summary == "-":
+        # stdout is reserved for the exported JSONL stream / the summary lines
+        log_to_stderr()
+    if args.summary == "-":
+        out = sys.stderr if to_stdout else sys.stdout
+    else:
+        out = open(args.summary, "a", encoding="utf-8")
+    def emit(summary):
+        out.write(json.dumps(summary) + "\n")
+        out.flush()
+
+    print_info(f"Batch: {len(jobs)} job(s), {args.concurrency} concurrent, download budget {args.download_budget}")
+    try:
+        summaries = run_jobs(jobs, concurrency=args.concurrency, download_budget=args.download_budget,
+                             headless=not args.visible, fast=not args.normal, on_summary=emit)
+    finally:
+        if out not in (sys.stdout, sys.stderr):
+            out.close()
+
+    failed = sum(1 for s in summaries if s["status"] != "ok")
+    total = sum(s["downloaded"] or 0 for s in summaries)
+    if failed:
+        print_warning(f"Batch finished: {total} files downloaded, {failed} job(s) failed.")
+        return 1
+    print_success(f"Batch finished: {total} files downloaded.")
+    return 0
@@ -1,15 +1,15 @@
 # pripper/browser.py
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
 
 from .utils import print_info
 from .config import SCROLL_PAUSE, MAX_SCROLLS
 
 def get_driver(headless: bool = True, fast: bool = True):
+    # Selenium and webdriver-manager take a few hundred ms to import; only pay when a browser starts
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
     options = Options()
     if headless:
         options.add_argument('--headless')
@@ -44,6 +44,7 @@ def get_driver(headless: bool = True, fast: bool = True):
 
 
 def scroll_page(driver):
+    from selenium.webdriver.common.by import By
     last_height = driver.execute_script("return document.body.scrollHeight")
     images_found_count = []
 
@@ -99,6 +100,7 @@ def is_avatar_image(img, driver):
                 return True
 
         try:
+            from selenium.webdriver.common.by import By
             for _ in range(3):
                 parent = img.find_element(By.XPATH, './..')
                 if not parent:
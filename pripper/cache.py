@@ -0,0 +1,103 @@
+# pripper/cache.py
+import os
+import json
+import time
+import sqlite3
+
+from .config import ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_MAX
+
+def default_cache_path():
+    if ANALYSIS_CACHE_PATH:
+        return os.path.expanduser(ANALYSIS_CACHE_PATH)
+    base = (os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "pripper", "analysis.sqlite")
+
+def _plain(value):
+    # numpy scalars (np.bool_, np.float32, ...) from the analysis kernels
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class FeatureCache:
+    """
+    Persistent image-analysis results keyed by (content SHA-256, analyzer
+    version). Only raw measurements are stored (dimensions, QR verdict, text
+    score, OCR letters, colour metrics), never thresholded verdicts, so
+    changing a filter threshold reuses every entry. Least-recently-used rows
+    are evicted once the table grows past `max_entries`.
+    """
+
+    def __init__(self, path=None, version="", max_entries=ANALYSIS_CACHE_MAX):
+        self.path = path or default_cache_path()
+        self.version = version
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " sha256 TEXT NOT NULL, version TEXT NOT NULL, data TEXT NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (sha256, version))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS features_lru ON features (last_used)")
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, digests):
+        """{sha256: features} for the digests that are cached."""
+        out = {}
+        digests = [d for d in set(digests) if d]
+        for i in range(0, len(digests), 500):
+            chunk = digests[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for sha, data in self.db.execute(
+                f"SELECT sha256, data FROM features WHERE version=? AND sha256 IN ({marks})",
+                (self.version, *chunk),
+            ):
+                out[sha] = json.loads(data)
+        if out:
+            now = time.time()
+            self.db.executemany("UPDATE features SET last_used=? WHERE sha256=? AND version=?",
+                                [(now, sha, self.version) for sha in out])
+            self.db.commit()
+        self.hits += len(out)
+        self.misses += len(digests) - len(out)
+        return out
+
+    def put_many(self, items):
+        """Store {sha256: features}; entries carrying an 'error' are skipped."""
+        now = time.time()
+        rows = [(sha, self.version, json.dumps(feat, default=_plain), now)
+                for sha, feat in items.items() if sha and not feat.get("error")]
+        if not rows:
+            return
+        self.db.executemany("INSERT OR REPLACE INTO features (sha256, version, data, last_used) VALUES (?, ?, ?, ?)",
+                            rows)
+        self.db.commit()
+        self._evict()
+
+    def _evict(self):
+        n = self.db.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+        if n <= self.max_entries:
+            return
+        # trim to 90% so eviction doesn't run on every insert
+        drop = n - int(self.max_entries * 0.9)
+        self.db.execute(
+            "DELETE FROM features WHERE rowid IN (SELECT rowid FROM features ORDER BY last_used LIMIT ?)", (drop,)
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+def open_cache(version):
+    """FeatureCache for `version`, or None if caching is disabled or unavailable."""
+    if ANALYSIS_CACHE_PATH is False:
+        return None
+    try:
+        return FeatureCache(version=version)
+    except Exception as e:
+        from .utils import print_warning
+        print_warning(f"Analysis cache unavailable ({e}); continuing without it.")
+        return None
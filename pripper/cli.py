@@ -1,14 +1,23 @@
 # pripper/cli.py
-import os
+import sys
 import time
 from colorama import Fore
 from .utils import print_info, print_success, print_warning, print_error
 from .browser import get_driver
 from .scrape import scroll_and_download_realtime, extract_image_urls_advanced
-from .files import get_next_index, create_zip_file
-from .net import download_images_concurrent
+from .files import create_zip_file
+from .net import download_to_dir
+from .config import CONTENT_STORE, METRICS_REPORT, METRICS_PROM
+from .store import open_store
+from . import metrics
+
+def main(argv=None):
+    """Interactive ripper; any command-line arguments switch to batch mode."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        from .batch import run_batch_cli
+        return run_batch_cli(argv)
 
-def main():
     print_info("Starting Enhanced Pinterest Ripper 🚀")
     print_info("=" * 50)
 
@@ -36,11 +45,15 @@ def main():
 
     zip_choice = input(Fore.YELLOW + "Create ZIP file after downloads? (y/n): ").strip().lower() == 'y'
 
+    if METRICS_REPORT or METRICS_PROM:
+        metrics.enable()
+
     while True:
         print(Fore.CYAN + "\n" + "="*50)
         url = input(Fore.YELLOW + "Enter Pinterest URL (or ENTER to quit): ").strip()
         if not url:
             print_info("Exiting Pinterest Ripper. Goodbye!")
+            metrics.finish()
             break
 
         advanced_mode = input(
@@ -64,18 +77,7 @@ def main():
                 urls = extract_image_urls_advanced(driver, url)
                 print_info(f"Media found: {len(urls)}")
                 if urls:
-                    import hashlib
-                    existing_hashes = set()
-                    for fname in os.listdir(target):
-                        p = os.path.join(target, fname)
-                        if os.path.isfile(p):
-                            try:
-                                with open(p, 'rb') as f:
-                                    existing_hashes.add(hashlib.sha256(f.read()).hexdigest())
-                            except Exception:
-                                pass
-                    next_idx = get_next_index(target)
-                    count, skipped, _ = download_images_concurrent(urls, target, existing_hashes, next_idx)
+                    count, skipped = download_to_dir(urls, target, store=open_store(CONTENT_STORE))
                     print_success(f"Complete! {count} new files downloaded, {skipped} skipped.")
                     if zip_choice and count > 0:
                         create_zip_file(target)
@@ -83,7 +85,7 @@ def main():
                     print_warning("No media found!")
             else:
                 print_info("Loading page and downloading media in real-time (concurrent batches)...")
-                scroll_and_download_realtime(driver, target)
+                scroll_and_download_realtime(driver, target, store=open_store(CONTENT_STORE))
 
             # Post-download filter menu
             from .filters import filter_downloaded_images
@@ -6,6 +6,20 @@ MAX_SCROLLS    = 50
 ADVANCED_DELAY = 1.2        # wait between pin opens in Advanced
 MAX_WORKERS    = 6          # parallel download workers (tune 4-8)
 MIN_IMAGE_BYTES = 1000
+MIN_IMAGE_PIXELS = 300      # width/height below this counts as a thumbnail/icon
+PROBE_BYTES    = 128 * 1024 # how far into a download the pre-write filters may look
+FILTER_WORKERS = None       # processes for filter analysis (None = all CPU cores)
+ANALYSIS_CACHE_PATH = None  # filter analysis cache (None = ~/.cache/pripper/analysis.sqlite, False = off)
+ANALYSIS_CACHE_MAX  = 200_000   # cached images kept (least recently used are evicted)
+SHARD_SIZE     = 1000       # files per 000/, 001/, … folder in the sharded layout
+CONTENT_STORE  = None       # shared media store folder for all boards (None = off; see --store)
+TYPED_FOLDERS  = True       # downloaded videos go straight into videos/
+METRICS_REPORT = None       # JSON metrics/trace report written at the end of a run (None = off)
+METRICS_PROM   = None       # Prometheus textfile written at the end of a run (None = off)
+METRICS_TRACE_MAX = 50_000  # media items traced per run; later items only count
+PROGRESS_INTERVAL = 0.25    # seconds between progress redraws on a terminal
+PROGRESS_LOG_INTERVAL = 10  # ... and between progress lines when output is piped/logged (0 = none)
+VERBOSE_LOG    = None       # per-file detail log (downloads, deletions, moves); None = off (see --log)
 
 # File type groups
 IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
@@ -0,0 +1,122 @@
+# pripper/export.py
+import os
+import sys
+import json
+import threading
+
+from .config import VIDEO_EXTS, GIF_EXTS
+from .utils import print_info, print_success, print_warning
+
+def canonical_key(url):
+    """Key used to spot the same media at different sizes (e.g. 736x vs originals)."""
+    return os.path.basename(url.split('?')[0].split('#')[0])
+
+def media_type(url):
+    ext = os.path.splitext(canonical_key(url))[1].lower()
+    if ext in VIDEO_EXTS:
+        return "video"
+    if ext in GIF_EXTS:
+        return "gif"
+    return "image"
+
+class JsonlExporter:
+    """
+    Streams discovered media as JSON lines to a file (or stdout for '-'):
+      {"url", "key", "pin_url", "type", "filename"}
+    A key is written again only when a better (/originals/) URL turns up; it
+    keeps the same suggested filename, so readers should let later lines win.
+    Safe to share between threads/jobs.
+    """
+
+    def __init__(self, path, start_idx=1):
+        self.path = path
+        self._fh = sys.stdout if path == "-" else open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._seen_urls = set()
+        self._by_key = {}   # key -> (url, filename)
+        self._next_idx = start_idx
+
+    def emit(self, url, pin_url=None):
+        """Write `url` if it is new (or upgrades a known key). Returns True if a line was written."""
+        if not url:
+            return False
+        key = canonical_key(url)
+        with self._lock:
+            if url in self._seen_urls:
+                return False
+            self._seen_urls.add(url)
+            prev = self._by_key.get(key)
+            if prev is not None and ('/originals/' in prev[0] or '/originals/' not in url):
+                return False
+            if prev is not None:
+                filename = prev[1]
+            else:
+                from .net import _ext_from_ctype_or_url
+                filename = f"image_{self._next_idx}{_ext_from_ctype_or_url(None, url)}"
+                self._next_idx += 1
+            self._by_key[key] = (url, filename)
+            rec = {"url": url, "key": key, "pin_url": pin_url, "type": media_type(url), "filename": filename}
+            self._fh.write(json.dumps(rec) + "\n")
+            self._fh.flush()
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._fh is not sys.stdout:
+                self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_export(path):
+    """Yield records from an export file ('-' = stdin), skipping blank/bad lines."""
+    fh = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                print_warning(f"Skipping bad export line: {line[:80]}")
+                continue
+            if isinstance(rec, dict) and rec.get("url"):
+                yield rec
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+def import_export_file(path, target_dir, budget=None, batch_size=200, prefilters=None, store=None):
+    """
+    Download every media URL listed in an export file straight into
+    `target_dir` (no browser). Later lines win per key, so /originals/
+    upgrades replace earlier thumbnails. Returns (downloaded, skipped).
+    """
+    from .files import hash_existing_files
+    from .net import download_images_concurrent
+
+    best = {}
+    for rec in read_export(path):
+        key = rec.get("key") or canonical_key(rec["url"])
+        prev = best.get(key)
+        if prev is None or '/originals/' in rec["url"] or '/originals/' not in prev:
+            best[key] = rec["url"]
+    urls = list(best.values())
+    print_info(f"Import: {len(urls)} media URLs from {path}")
+    if not urls:
+        return 0, 0
+
+    os.makedirs(target_dir, exist_ok=True)
+    existing_hashes = hash_existing_files(target_dir)
+    count = skipped = 0
+    for i in range(0, len(urls), batch_size):
+        got, skip = download_images_concurrent(urls[i:i + batch_size], target_dir, existing_hashes,
+                                               budget=budget, prefilters=prefilters, store=store)
+        count += got
+        skipped += skip
+    print_success(f"Import complete! {count} new files downloaded, {skipped} skipped.")
+    return count, skipped
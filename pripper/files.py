@@ -1,80 +1,442 @@
 # pripper/files.py
 import os
 import re
-from .config import ALL_EXTS, IMAGE_EXTS
+import json
+import threading
+from .config import ALL_EXTS, IMAGE_EXTS, VIDEO_EXTS, SHARD_SIZE, TYPED_FOLDERS
+from . import metrics
 
-def get_next_index(target_dir):
-    max_idx = 0
-    pattern = re.compile(r"image_(\d+)\.(?:jpg|png|jpeg|webp|gif|mp4|m4v|webm|mov)$", re.IGNORECASE)
-    if os.path.exists(target_dir):
-        for fname in os.listdir(target_dir):
-            m = pattern.match(fname)
-            if m:
-                idx = int(m.group(1))
-                if idx > max_idx:
-                    max_idx = idx
-    return max_idx + 1
+INDEX_MANIFEST = ".pripper_index"
+
+def sha256_file(path, chunk_size=1 << 20):
+    """Streaming SHA-256 hex digest of a file."""
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _partial_digest(path, edge=64 * 1024):
+    """SHA-256 of the first and last `edge` bytes (whole file if it's smaller)."""
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        h.update(f.read(edge))
+        if size > 2 * edge:
+            f.seek(-edge, os.SEEK_END)
+            h.update(f.read(edge))
+        elif size > edge:
+            h.update(f.read())
+    return h.hexdigest()
+
+def find_duplicates(paths, workers=None):
+    """
+    Return [(duplicate_path, original_path)] for byte-identical files, the
+    first occurrence in `paths` being the original. Work is tiered so most
+    files are never read: group by size, then hash the first/last 64 KB of
+    size collisions, then full-hash only what still collides. Hashing runs
+    in a thread pool (hashlib releases the GIL). Unreadable files are skipped.
+    """
+    import concurrent.futures
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+
+    def tier(groups, digest):
+        # split each group of candidate paths by `digest`, keeping groups with >1 member
+        flat = [p for g in groups for p in g]
+        if not flat:
+            return []
+        metrics.count(f"files.dedupe.{digest.__name__.strip('_')}", len(flat))
+        def safe(p):
+            try:
+                return digest(p)
+            except OSError:
+                return None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+            digests = dict(zip(flat, ex.map(safe, flat)))
+        out = []
+        for g in groups:
+            split = {}
+            for p in g:
+                if digests[p] is not None:
+                    split.setdefault(digests[p], []).append(p)
+            out.extend(v for v in split.values() if len(v) > 1)
+        return out
+
+    by_size = {}
+    for p in paths:
+        try:
+            by_size.setdefault(os.path.getsize(p), []).append(p)
+        except OSError:
+            continue
+    groups = [g for g in by_size.values() if len(g) > 1]
+    with metrics.timer("files.dedupe"):
+        groups = tier(groups, _partial_digest)
+        groups = tier(groups, sha256_file)
+
+    order = {p: i for i, p in enumerate(paths)}
+    dups = []
+    for g in groups:
+        g.sort(key=order.get)
+        dups.extend((p, g[0]) for p in g[1:])
+    dups.sort(key=lambda t: order[t[0]])
+    return dups
+
+def hash_existing_files(target_dir):
+    """SHA-256 of every file already in `target_dir`, its media subfolders and
+    their shards (used to skip re-downloads, wherever a file was sorted to)."""
+    hashes = set()
+    with metrics.timer("files.hash_existing"):
+        for d in media_dirs(target_dir):
+            for rel in iter_media(d, exts=None):
+                try:
+                    hashes.add(sha256_file(os.path.join(d, rel)))
+                except Exception:
+                    pass
+    return hashes
+
+def media_dirs(target_dir):
+    """`target_dir` followed by its subfolders (videos/, gifs/, color_images/, …), shard folders excluded."""
+    dirs = [target_dir]
+    try:
+        with os.scandir(target_dir) as it:
+            dirs += sorted(e.path for e in it
+                           if not e.name.startswith('.') and not _SHARD_RE.match(e.name) and e.is_dir())
+    except OSError:
+        pass
+    return dirs
+
+def typed_dir(target_dir, ext):
+    """Folder a freshly downloaded file with extension `ext` is written to (videos/ or the target).
+    GIFs stay at the top level: the image filters (small, text-like, colour) still judge them."""
+    if TYPED_FOLDERS and ext in VIDEO_EXTS:
+        return os.path.join(target_dir, "videos")
+    return target_dir
 
 def get_next_index_in(dir_path):
     """
     Return next index N for a filename like image_N.ext in `dir_path`
-    (counts images, gifs, and videos).
+    (counts images, gifs, and videos, including those in shard folders).
     """
     max_idx = 0
     pattern = re.compile(r"image_(\d+)\.(?:jpg|jpeg|png|webp|gif|mp4|webm|mov|m4v)$", re.IGNORECASE)
-    if os.path.isdir(dir_path):
-        for fname in os.listdir(dir_path):
-            m = pattern.match(fname)
-            if m:
-                idx = int(m.group(1))
-                if idx > max_idx:
-                    max_idx = idx
+    for rel in iter_media(dir_path):
+        m = pattern.match(os.path.basename(rel))
+        if m:
+            idx = int(m.group(1))
+            if idx > max_idx:
+                max_idx = idx
     return max_idx + 1
 
-def move_with_increment(src_path, dest_dir):
+# --------- Sharded layout ----------
+# A folder holding LAYOUT_MARKER keeps image_N files in subfolders of
+# `shard_size` indices each (000/, 001/, …); its direct subfolders
+# (color_images/, videos/, …) follow the same layout. Everything that walks
+# media uses iter_media(), which yields paths relative to the folder, so
+# callers can keep joining them onto the folder as before.
+
+LAYOUT_MARKER = ".pripper_layout"
+_SHARD_RE = re.compile(r"^\d{3,}$")
+_INDEX_RE = re.compile(r"^image_(\d+)\.", re.IGNORECASE)
+_layouts = {}
+
+def _read_layout(dir_path):
+    try:
+        with open(os.path.join(dir_path, LAYOUT_MARKER), "r", encoding="utf-8") as f:
+            return int(json.load(f)["shard_size"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def shard_size(dir_path):
+    """Files per shard if `dir_path` (or the folder it sits in) is sharded, else None."""
+    key = os.path.abspath(dir_path)
+    if key not in _layouts:
+        size = _read_layout(key)
+        if size is None and not _SHARD_RE.match(os.path.basename(key)):
+            size = _read_layout(os.path.dirname(key))
+        _layouts[key] = size
+    return _layouts[key]
+
+def enable_sharding(dir_path, size=SHARD_SIZE):
+    """Mark `dir_path` as sharded; new files go to shard folders from now on."""
+    os.makedirs(dir_path, exist_ok=True)
+    current = _read_layout(dir_path)
+    if current:
+        return current
+    with open(os.path.join(dir_path, LAYOUT_MARKER), "w", encoding="utf-8") as f:
+        json.dump({"layout": "sharded", "shard_size": int(size)}, f)
+    _layouts.clear()
+    return int(size)
+
+def media_relpath(dir_path, fname):
+    """Where a file named `fname` belongs inside `dir_path` ('NNN/image_N.ext' when sharded)."""
+    size = shard_size(dir_path)
+    m = _INDEX_RE.match(fname) if size else None
+    if m:
+        return os.path.join(f"{int(m.group(1)) // size:03d}", fname)
+    return fname
+
+def iter_media(dir_path, exts=ALL_EXTS):
+    """
+    Yield media files in `dir_path` as paths relative to it: files at the top
+    level first, then each shard folder in order. `exts=None` yields every
+    (non-hidden) file. Other subfolders are not entered.
+    """
+    try:
+        it = os.scandir(dir_path)
+    except OSError:
+        return
+    sharded = shard_size(dir_path) is not None
+    shards = []
+    with it:
+        for e in it:
+            if e.name.startswith('.'):
+                continue
+            if e.is_file():
+                if exts is None or e.name.lower().endswith(exts):
+                    yield e.name
+            elif sharded and _SHARD_RE.match(e.name) and e.is_dir():
+                shards.append(e.name)
+    for shard in sorted(shards):
+        try:
+            with os.scandir(os.path.join(dir_path, shard)) as sit:
+                for e in sit:
+                    if (not e.name.startswith('.') and e.is_file()
+                            and (exts is None or e.name.lower().endswith(exts))):
+                        yield os.path.join(shard, e.name)
+        except OSError:
+            continue
+
+def prune_shards(dir_path):
+    """Remove shard folders that have been emptied."""
+    if shard_size(dir_path) is None or not os.path.isdir(dir_path):
+        return
+    for name in os.listdir(dir_path):
+        if _SHARD_RE.match(name):
+            try:
+                os.rmdir(os.path.join(dir_path, name))
+            except OSError:
+                pass    # not empty
+
+def migrate_to_shards(target_dir, size=SHARD_SIZE):
     """
-    Move `src_path` into `dest_dir`. If a same-name file exists, rename to the
-    next image_{N}.ext in that folder. Returns final destination path.
+    Convert an existing flat folder (and its media subfolders) to the sharded
+    layout. Only image_N files move; other names stay where they are. Safe to
+    re-run after an interruption. Returns the number of files moved.
     """
-    os.makedirs(dest_dir, exist_ok=True)
-    base = os.path.basename(src_path)
-    dest_path = os.path.join(dest_dir, base)
+    from .utils import print_info, print_success
+    size = enable_sharding(target_dir, size)
+    dirs = [target_dir] + [os.path.join(target_dir, d) for d in sorted(os.listdir(target_dir))
+                           if os.path.isdir(os.path.join(target_dir, d))
+                           and not _SHARD_RE.match(d) and not d.startswith('.')]
+    moved = 0
+    for d in dirs:
+        made = set()
+        with os.scandir(d) as it:
+            names = [e.name for e in it if e.is_file() and _INDEX_RE.match(e.name)]
+        for name in names:
+            rel = media_relpath(d, name)
+            shard = os.path.dirname(rel)
+            if shard not in made:
+                os.makedirs(os.path.join(d, shard), exist_ok=True)
+                made.add(shard)
+            try:
+                move_no_clobber(os.path.join(d, name), os.path.join(d, rel))
+            except FileExistsError:
+                continue    # name taken inside the shard; leave the flat copy for inspection
+            moved += 1
+        if names:
+            print_info(f"{d}: {len(names)} files into shards of {size}")
+    print_success(f"Sharded layout ready: {moved} files moved.")
+    return moved
 
-    # Fast path: no collision
-    if not os.path.exists(dest_path):
+class IndexAllocator:
+    """
+    Hands out image_N indices for one directory without rescanning it.
+
+    The next free index lives in a small manifest (INDEX_MANIFEST) inside the
+    directory, seeded by a single scan the first time it is needed. Every
+    allocation reads and bumps it under an exclusive file lock (plus a thread
+    lock), so threads and separate processes writing into the same folder
+    never get the same N. Files added behind the manifest's back are handled
+    by the write/move helpers, which skip names that already exist.
+    """
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        self.path = os.path.join(dir_path, INDEX_MANIFEST)
+        self._lock = threading.Lock()
+
+    def allocate(self, n=1):
+        """Reserve `n` consecutive indices and return the first."""
+        os.makedirs(self.dir_path, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _lock_fd(fd)
+                raw = os.read(fd, 64).strip()
+                try:
+                    idx = int(raw)
+                except ValueError:
+                    idx = get_next_index_in(self.dir_path)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(idx + n).encode())
+                return idx
+            finally:
+                os.close(fd)    # closing releases the lock
+
+    def peek(self):
+        """The index allocate() would hand out next, without reserving it (read-only)."""
+        try:
+            with open(self.path, "rb") as f:
+                return int(f.read(64).strip())
+        except (OSError, ValueError):
+            return get_next_index_in(self.dir_path)
+
+    def _fresh_path(self, ext):
+        rel = media_relpath(self.dir_path, f"image_{self.allocate()}{ext}")
+        if os.sep in rel:
+            os.makedirs(os.path.join(self.dir_path, os.path.dirname(rel)), exist_ok=True)
+        return rel
+
+    def write_new(self, data, ext):
+        """Write `data` to a fresh image_N{ext}; returns its path relative to the folder."""
+        while True:
+            rel = self._fresh_path(ext)
+            try:
+                with open(os.path.join(self.dir_path, rel), 'xb') as f:
+                    f.write(data)
+                return rel
+            except FileExistsError:
+                continue
+
+    def link_new(self, src_path, ext):
+        """Hardlink `src_path` as a fresh image_N{ext} (copying if linking fails); returns the relative path."""
+        import shutil
+        while True:
+            rel = self._fresh_path(ext)
+            dest = os.path.join(self.dir_path, rel)
+            try:
+                os.link(src_path, dest)
+                return rel
+            except FileExistsError:
+                continue
+            except OSError:
+                pass    # cross-device or no hardlink support
+            try:
+                with open(src_path, 'rb') as src, open(dest, 'xb') as out:
+                    shutil.copyfileobj(src, out)
+                return rel
+            except FileExistsError:
+                continue
+
+    def move_in(self, src_path, ext):
+        """Move `src_path` to a fresh image_N{ext}; returns the destination path."""
+        while True:
+            dest = os.path.join(self.dir_path, self._fresh_path(ext))
+            try:
+                move_no_clobber(src_path, dest)
+                return dest
+            except FileExistsError:
+                continue
+
+def move_no_clobber(src_path, dest_path):
+    """
+    Move `src_path` to `dest_path`, raising FileExistsError if that name is
+    taken. os.rename would silently replace a file another writer created
+    after an exists() check, so the name is claimed with a hardlink (atomic,
+    fails if present) and the source unlinked; only filesystems without
+    hardlinks fall back to a checked rename.
+    """
+    try:
+        os.link(src_path, dest_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        if os.path.exists(dest_path):
+            raise FileExistsError(dest_path)
         os.rename(src_path, dest_path)
-        return dest_path
-
-    # Collision -> bump to next index
-    _, ext = os.path.splitext(base)
-    next_idx = get_next_index_in(dest_dir)
-    new_name = f"image_{next_idx}{ext.lower()}"
-    dest_path = os.path.join(dest_dir, new_name)
-    os.rename(src_path, dest_path)
-    return dest_path
-
-def _move_to_dir(src_path, dest_dir):
-    os.makedirs(dest_dir, exist_ok=True)
-    base = os.path.basename(src_path)
-    name, ext = os.path.splitext(base)
-    dest = os.path.join(dest_dir, base)
-    i = 1
-    while os.path.exists(dest):
-        dest = os.path.join(dest_dir, f"{name}_{i}{ext}")
-        i += 1
-    os.rename(src_path, dest)
-    return dest
+        return
+    os.unlink(src_path)
+
+def _lock_fd(fd):
+    if os.name == 'nt':
+        import msvcrt
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+def index_allocator(dir_path):
+    """Shared IndexAllocator for `dir_path` (one per directory per process)."""
+    key = os.path.abspath(dir_path)
+    with _allocators_lock:
+        alloc = _allocators.get(key)
+        if alloc is None:
+            alloc = _allocators[key] = IndexAllocator(dir_path)
+        return alloc
+
+def _zip_time(mtime):
+    # ZIP timestamps have 2-second resolution
+    import time
+    t = time.localtime(mtime)
+    return t[:5] + (t[5] // 2 * 2,)
 
 def create_zip_file(target_dir):
-    """Create ZIP file from downloaded images/videos (keeps structure)."""
+    """
+    Create or update `<target_dir>.zip` with the downloaded images/videos
+    (keeps structure). Media is stored uncompressed. An existing archive is
+    only appended to when every entry in it still matches a file on disk
+    (same size and mtime); otherwise, e.g. after the filters moved or deleted
+    files, it is rebuilt into a temp file and swapped in.
+    """
     import zipfile
-    zip_path = target_dir.rstrip('/\\') + '.zip'
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for root, _, files in os.walk(target_dir):
-            for fname in files:
-                if fname.lower().endswith(ALL_EXTS):
-                    full = os.path.join(root, fname)
-                    arcname = os.path.relpath(full, start=os.path.dirname(target_dir))
-                    zf.write(full, arcname)
-    from .utils import print_success
+    from .utils import print_success, print_info
+    target_dir = target_dir.rstrip('/\\')
+    zip_path = target_dir + '.zip'
+    base = os.path.dirname(os.path.abspath(target_dir))
+
+    wanted = {}     # arcname -> (path, size, zip time)
+    for root, _, files in os.walk(target_dir):
+        for fname in files:
+            if fname.lower().endswith(ALL_EXTS):
+                full = os.path.join(root, fname)
+                st = os.stat(full)
+                arcname = os.path.relpath(os.path.abspath(full), start=base).replace(os.sep, '/')
+                wanted[arcname] = (full, st.st_size, _zip_time(st.st_mtime))
+
+    # Only ALL_EXTS media goes in, all of it already compressed (JPEG/PNG/
+    # WebP/GIF/MP4/...): deflating it again burns CPU for ~0% gain.
+    def add(zf, arcname):
+        zf.write(wanted[arcname][0], arcname, compress_type=zipfile.ZIP_STORED)
+
+    existing = None
+    if os.path.isfile(zip_path):
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zf:
+                existing = {zi.filename: (zi.file_size, zi.date_time) for zi in zf.infolist()}
+        except (zipfile.BadZipFile, OSError):
+            existing = None
+
+    if existing is not None and all(wanted.get(n, (None,))[1:] == v for n, v in existing.items()):
+        missing = [n for n in wanted if n not in existing]
+        if missing:
+            with zipfile.ZipFile(zip_path, 'a') as zf:
+                for arcname in missing:
+                    add(zf, arcname)
+        print_success(f"ZIP updated: {zip_path} (+{len(missing)} files, {len(existing)} already in it)")
+        return
+
+    if existing is not None:
+        print_info("ZIP is out of date with the folder; rebuilding it.")
+    tmp = zip_path + '.tmp'
+    with zipfile.ZipFile(tmp, 'w') as zf:
+        for arcname in wanted:
+            add(zf, arcname)
+    os.replace(tmp, zip_path)
     print_success(f"ZIP created: {zip_path}")
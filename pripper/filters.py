@@ -1,275 +1,360 @@
 # pripper/filters.py
 import os
 from .utils import print_info, print_success, print_warning, print_error
-from .config import IMAGE_EXTS, VIDEO_EXTS, GIF_EXTS, ALL_EXTS
-from .files import move_with_increment
-
-# --------- Text/QR detection helpers ---------
-def _has_qr_cv2(filepath):
-    """True if a QR is detected (OpenCV)."""
-    try:
-        import cv2
-        img = cv2.imread(filepath)
-        if img is None:
-            return False
-        det = cv2.QRCodeDetector()
-        data, pts, _ = det.detectAndDecode(img)
-        return pts is not None and pts.any()
-    except Exception:
-        return False
-
-def _ocr_letters(filepath):
-    """Return alnum char count via pytesseract, or None if unavailable."""
-    try:
-        from PIL import Image
-        import pytesseract
-        txt = pytesseract.image_to_string(Image.open(filepath))
-        return sum(ch.isalnum() for ch in txt)
-    except Exception:
-        return None
-
-def _textlike_score_cv2(filepath, resize_to=900):
-    """
-    Heuristic score (0..1) for 'text/screenshot-like' using OpenCV only:
-    combines edge density + many small components + large white background.
-    """
-    try:
-        import cv2, numpy as np
-        img = cv2.imread(filepath)
-        if img is None:
-            return 0.0
-        h, w = img.shape[:2]
-        s = min(1.0, float(resize_to) / max(h, w)) if max(h, w) > resize_to else 1.0
-        if s < 1.0:
-            img = cv2.resize(img, (int(w*s), int(h*s)), interpolation=cv2.INTER_AREA)
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(cv2.GaussianBlur(gray, (3,3), 0), 80, 160)
-        edge_density = float((edges > 0).mean())
-
-        thr = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                    cv2.THRESH_BINARY_INV, 25, 10)
-        kernel = np.ones((3,3), np.uint8)
-        opened = cv2.morphologyEx(thr, cv2.MORPH_OPEN, kernel, iterations=1)
-        n, labels, stats, _ = cv2.connectedComponentsWithStats(opened, 8)
-        areas = stats[1:, cv2.CC_STAT_AREA].astype(np.float32) if n > 1 else np.array([])
-        img_area = float(opened.shape[0] * opened.shape[1])
-        small = ((areas > img_area*0.0002) & (areas < img_area*0.02)).sum()
-        small_ratio = small / max(len(areas), 1)
-
-        white_bg_ratio = float((gray >= 240).mean())
-        score = 0.45*small_ratio + 0.35*edge_density + 0.20*white_bg_ratio
-        return max(0.0, min(1.0, float(score)))
-    except Exception:
-        return 0.0
+from .config import IMAGE_EXTS, VIDEO_EXTS, GIF_EXTS, ALL_EXTS, MIN_IMAGE_PIXELS
+from .files import find_duplicates, iter_media, prune_shards, media_relpath, index_allocator, move_no_clobber
+from .analysis import ImageAnalyzer, ANALYZER_VERSION, features_for
+from .cache import open_cache
+from . import metrics, progress
 
 # --------- Color classification ----------
 def _is_greyish(
-        filepath,
-        sat_low=0.22,           # pixel considered low-saturation if S<0.22
+        colour,
         sat_px_fraction=0.85,   # need ≥85% low-sat pixels
         sat_p90_max=0.35,       # 90th percentile of S must be ≤0.35
         colorfulness_thresh=18.0,   # Hasler–Süsstrunk: lower = greyer
         mean_chroma_thresh=8.0,     # LAB mean chroma
-        resize_to=256
 ):
     """
-    Return True if image is greyscale/greyish (low saturation & low colorfulness).
-    Returns None if Pillow is missing; any file error => None (treated as COLOR by caller).
+    Return True if image is greyscale/greyish (low saturation & low colorfulness),
+    judged from analysis.colour_metrics(). Returns None when `colour` is missing
+    (Pillow missing or file error => treated as COLOR by caller).
+    The per-pixel low-saturation cut-off is analysis.SAT_LOW.
     """
-    try:
-        from PIL import Image, ImageFile
-        ImageFile.LOAD_TRUNCATED_IMAGES = True
-    except ImportError:
+    if not colour:
         return None
+    greyish_by_sat = (colour["frac_low"] >= sat_px_fraction) and (colour["p90"] <= sat_p90_max)
+    greyish_by_colorfulness = ((colour["colorfulness"] <= colorfulness_thresh)
+                               and (colour["chroma_mean"] <= mean_chroma_thresh))
+    return bool(greyish_by_sat or greyish_by_colorfulness)
+
+# --------- Filter plan ----------
+# A filter run scans the target once, lets every selected filter record a
+# verdict per file (delete, or move to a subfolder) against that in-memory
+# listing, and only then touches the disk, in one pass. Nothing is renamed
+# twice, and a dry run can show the whole outcome without changing a file.
+
+FILTER_IMAGE_EXTS = IMAGE_EXTS + GIF_EXTS   # what the image filters look at
+KEPT_DIRS = ("color_images", "greyscale_images")    # the sorted collection from earlier runs
+
+def _deleted(path, by):
+    """Record a filter deletion in the run metrics (and the item's trace)."""
+    metrics.count(f"filters.deleted.{by}")
+    metrics.trace_file(path, "deleted", by=by)
+
+class FilterPlan:
+    """
+    Verdicts for the media in `target_dir` (top level and shards), from a
+    single scan. Filters read live() - files with no verdict yet - and call
+    delete() or move(); apply() then carries everything out.
+    """
 
-    try:
-        import numpy as np
-        NP = True
-    except ImportError:
-        NP = False
-
-    try:
-        with Image.open(filepath) as im:
-            im.load()
-            im = im.convert('RGB')
-            if resize_to:
-                im.thumbnail((resize_to, resize_to), Image.BILINEAR)
-
-            hsv = im.convert('HSV')
-            _, s, v = hsv.split()
-            s_data = list(s.getdata())
-            v_data = list(v.getdata())
-            mid_mask = [20 <= vv <= 245 for vv in v_data]
-            s_mid = [sv for sv, keep in zip(s_data, mid_mask) if keep] or s_data
-
-            if NP:
-                s_arr = __import__('numpy').array(s_mid, dtype='float32') / 255.0
-                p90 = float(__import__('numpy').percentile(s_arr, 90))
-                frac_low = float((s_arr < sat_low).mean())
-            else:
-                s_arr = [sv / 255.0 for sv in s_mid]
-                s_sorted = sorted(s_arr)
-                n = len(s_sorted)
-                def percentile(p):
-                    if n == 0: return 0.0
-                    k = (p/100) * (n-1)
-                    f = int(k)
-                    c = min(f+1, n-1)
-                    return s_sorted[f] + (k-f) * (s_sorted[c]-s_sorted[f]) if n > 1 else s_sorted[0]
-                p90 = percentile(90)
-                frac_low = (sum(1 for sv in s_arr if sv < sat_low) / n) if n else 1.0
-
-            greyish_by_sat = (frac_low >= sat_px_fraction) and (p90 <= sat_p90_max)
-
-            px = list(im.getdata())
-            if NP:
-                arr = __import__('numpy').array(px, dtype='float32')
-                R, G, B = arr[:, 0], arr[:, 1], arr[:, 2]
-                rg = R - G
-                yb = 0.5 * (R + G) - B
-                c_var  = float((__import__('numpy').var(rg) + __import__('numpy').var(yb)) ** 0.5)
-                mrg, myb = float(rg.mean()), float(yb.mean())
-                c_mean = float((mrg**2 + myb**2) ** 0.5)
-                colorfulness = c_var + 0.3 * c_mean
-            else:
-                R = [p[0] for p in px]; G = [p[1] for p in px]; B = [p[2] for p in px]
-                rg = [r-g for r,g in zip(R,G)]
-                yb = [0.5*(r+g)-b for r,g,b in zip(R,G,B)]
-                def mean(lst): return sum(lst)/len(lst) if lst else 0.0
-                def var(lst):
-                    m = mean(lst)
-                    return (sum((x-m)*(x-m) for x in lst)/len(lst)) if lst else 0.0
-                c_var = (var(rg) + var(yb)) ** 0.5
-                mrg, myb = mean(rg), mean(yb)
-                c_mean = (mrg*mrg + myb*myb) ** 0.5
-                colorfulness = c_var + 0.3 * c_mean
-
-            lab = im.convert('LAB')
-            _, A, Bc = lab.split()
-            a_data = list(A.getdata()); b_data = list(Bc.getdata())
-            if NP:
-                np = __import__('numpy')
-                a_arr = np.array(a_data, dtype=np.float32) - 128.0
-                b_arr = np.array(b_data, dtype=np.float32) - 128.0
-                chroma_mean = float(np.sqrt(a_arr*a_arr + b_arr*b_arr).mean())
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        self.files = list(iter_media(target_dir, ALL_EXTS))
+        self.verdicts = {}      # relpath -> ("delete", reason, detail) or ("move", subfolder, detail)
+        self.after_apply = []   # callbacks for state that must only be saved for real (phash index)
+        self.moved = {}         # relpath -> new relpath, filled in by apply()
+
+    def live(self, exts=ALL_EXTS):
+        return [f for f in self.files if f not in self.verdicts and f.lower().endswith(exts)]
+
+    def kept(self, exts=ALL_EXTS):
+        """Like live(), but including files an earlier filter only decided to move."""
+        return [f for f in self.files if self.verdicts.get(f, ("move",))[0] == "move" and f.lower().endswith(exts)]
+
+    def delete(self, f, by, detail=""):
+        self.verdicts[f] = ("delete", by, detail)
+
+    def move(self, f, subdir):
+        self.verdicts[f] = ("move", subdir, "")
+
+    def counts(self):
+        """{('delete', reason) or ('move', subfolder): number of files}."""
+        out = {}
+        for action, what, _ in self.verdicts.values():
+            out[(action, what)] = out.get((action, what), 0) + 1
+        return out
+
+    def _destinations(self, subdir, names, first_index):
+        """
+        [(relpath, destination path relative to the subfolder)]. A file keeps
+        its name unless it is taken there; taken names get the next image_N
+        from `first_index(dest_dir, count)`, which reserves a block of indices
+        (asked again only for numbers another planned file already kept).
+        """
+        dest_dir = os.path.join(self.target_dir, subdir)
+        taken = set(iter_media(dest_dir, exts=None))
+        out, clash = [], []
+        for f in names:
+            rel = media_relpath(dest_dir, os.path.basename(f))
+            if rel in taken:
+                clash.append(f)
             else:
-                chroma_mean = (
-                    sum(((ad-128.0)**2 + (bd-128.0)**2) ** 0.5 for ad, bd in zip(a_data, b_data)) / len(a_data)
-                    if a_data else 0.0
-                )
-
-            greyish_by_colorfulness = (colorfulness <= colorfulness_thresh) and (chroma_mean <= mean_chroma_thresh)
-            return bool(greyish_by_sat or greyish_by_colorfulness)
-
-    except Exception:
-        return None
-
-# --------- Filter actions (delete/move/sort) ----------
-def filter_small_images(target_dir, image_files, min_pixels=300, fallback_bytes=25_000):
-    """Delete small images."""
-    print_info("Deleting small images...")
+                taken.add(rel)
+                out.append((f, rel))
+        while clash:
+            start = first_index(dest_dir, len(clash))
+            retry = []
+            for i, f in enumerate(clash):
+                rel = media_relpath(dest_dir, f"image_{start + i}{os.path.splitext(f)[1].lower()}")
+                if rel in taken:
+                    retry.append(f)
+                else:
+                    taken.add(rel)
+                    out.append((f, rel))
+            clash = retry
+        return out
+
+    def _moves(self):
+        by_dir = {}
+        for f, (action, subdir, _) in self.verdicts.items():
+            if action == "move":
+                by_dir.setdefault(subdir, []).append(f)
+        return by_dir
+
+    def preview(self):
+        """Report what apply() would do, without touching the disk. Per-file lines go to the verbose log."""
+        nexts = {}
+        def peek(dest_dir, n):
+            start = nexts.get(dest_dir) or index_allocator(dest_dir).peek()
+            nexts[dest_dir] = start + n
+            return start
+        for f, (action, by, detail) in self.verdicts.items():
+            if action == "delete":
+                progress.log(f"Would delete ({by}): {f}" + (f" ({detail})" if detail else ""))
+        for subdir, names in self._moves().items():
+            for f, rel in self._destinations(subdir, names, peek):
+                progress.log(f"Would move {f} -> {os.path.join(subdir, rel)}")
+        self._report("Dry run: would delete", "would move")
+
+    def apply(self):
+        """Delete, then move each subfolder's files in one go (folders made once, clashes numbered in one block)."""
+        def allocate(dest_dir, n):
+            return index_allocator(dest_dir).allocate(n)
+        with progress.Progress("Applying", total=len(self.verdicts)) as prog:
+            for f, (action, by, detail) in self.verdicts.items():
+                if action != "delete":
+                    continue
+                p = os.path.join(self.target_dir, f)
+                prog.advance()
+                try:
+                    os.remove(p)
+                    _deleted(p, by)
+                    progress.log(f"Deleted ({by}): {f}" + (f" ({detail})" if detail else ""))
+                except OSError as e:
+                    print_warning(f"Could not delete {f}: {e}")
+            for subdir, names in self._moves().items():
+                dest_dir = os.path.join(self.target_dir, subdir)
+                made = set()
+                for f, rel in self._destinations(subdir, names, allocate):
+                    src = os.path.join(self.target_dir, f)
+                    dest = os.path.join(dest_dir, rel)
+                    prog.advance()
+                    try:
+                        parent = os.path.dirname(dest)
+                        if parent not in made:
+                            os.makedirs(parent, exist_ok=True)
+                            made.add(parent)
+                        try:
+                            move_no_clobber(src, dest)
+                        except FileExistsError:     # written behind the index manifest's back
+                            dest = index_allocator(dest_dir).move_in(src, os.path.splitext(f)[1].lower())
+                        self.moved[f] = os.path.relpath(dest, self.target_dir)
+                        metrics.count("files.moved")
+                        metrics.trace_file(src, "moved", to=dest)
+                        progress.log(f"Moved {f} -> {os.path.relpath(dest, self.target_dir)}")
+                    except OSError as e:
+                        print_warning(f"Could not move {f}: {e}")
+        for callback in self.after_apply:
+            callback()
+        self._report("Deleted", "moved")
+
+    def _report(self, deleted_word, moved_word):
+        counts = self.counts()
+        dels = {what: n for (action, what), n in counts.items() if action == "delete"}
+        moves = {what: n for (action, what), n in counts.items() if action == "move"}
+        print_success(f"{deleted_word} {sum(dels.values())} files"
+                      + (f" ({', '.join(f'{k}: {v}' for k, v in sorted(dels.items()))})" if dels else "")
+                      + f", {moved_word} {sum(moves.values())}"
+                      + (f" ({', '.join(f'{k}: {v}' for k, v in sorted(moves.items()))})" if moves else "")
+                      + ".")
+
+# --------- Filters (each records verdicts in a FilterPlan) ----------
+def filter_small_images(plan, min_pixels=MIN_IMAGE_PIXELS, fallback_bytes=25_000, analyzer=None):
+    """Delete small images. Downloads made with net.min_dimensions_prefilter
+    never reach disk when small, so this only catches files from other sources."""
+    print_info("Checking for small images...")
     try:
-        from PIL import Image
+        from PIL import Image  # noqa: F401
         PIL_AVAILABLE = True
     except ImportError:
         PIL_AVAILABLE = False
         print_warning("Pillow not installed; falling back to file-size threshold. (pip install pillow)")
-    deleted = 0
-
-    if not PIL_AVAILABLE:
+    target_dir = plan.target_dir
+    image_files = plan.live(FILTER_IMAGE_EXTS)
+    found = 0
+    analyzer = analyzer or ImageAnalyzer(target_dir, ("dims",))
+    with progress.Progress("Checking sizes", total=len(image_files)) as prog:
         for filename in image_files:
-            p = os.path.join(target_dir, filename)
+            prog.advance()
             try:
-                if os.path.getsize(p) < fallback_bytes:
-                    os.remove(p); deleted += 1
-                    print_info(f"Deleted small file: {filename}")
+                if not PIL_AVAILABLE:
+                    size = os.path.getsize(os.path.join(target_dir, filename))
+                    if size < fallback_bytes:
+                        plan.delete(filename, "small", f"{size} bytes"); found += 1
+                    continue
+                res = analyzer.get(filename, "dims")
+                if res.get("error"):
+                    raise ValueError(res["error"])
+                w, h = res["width"], res["height"]
+                if w < min_pixels or h < min_pixels:
+                    plan.delete(filename, "small", f"{w}x{h}"); found += 1
             except Exception as e:
                 print_warning(f"Could not check {filename}: {e}")
-        print_success(f"Deleted {deleted} small images.")
-        return
-
-    from PIL import Image
-    for filename in image_files:
-        p = os.path.join(target_dir, filename)
-        try:
-            with Image.open(p) as img:
-                w, h = img.size
-            if w < min_pixels or h < min_pixels:
-                os.remove(p); deleted += 1
-                print_info(f"Deleted small image: {filename} ({w}x{h})")
-        except Exception as e:
-            print_warning(f"Could not check {filename}: {e}")
-    print_success(f"Deleted {deleted} small images.")
-
-def filter_duplicates(target_dir, files_all_media):
-    """Delete exact duplicates (byte-identical) across images/gifs/videos)."""
-    print_info("Deleting exact duplicates...")
-    import hashlib
-    seen = {}
-    deleted = 0
-    for filename in files_all_media:
-        p = os.path.join(target_dir, filename)
-        try:
-            with open(p, 'rb') as f:
-                h = hashlib.sha256(f.read()).hexdigest()
-            if h in seen:
-                os.remove(p); deleted += 1
-                print_info(f"Deleted duplicate: {filename} (duplicate of {seen[h]})")
-            else:
-                seen[h] = filename
-        except Exception as e:
-            print_warning(f"Could not hash {filename}: {e}")
-    print_success(f"Deleted {deleted} duplicates.")
-
-def filter_textlike_images(target_dir, image_files, score_threshold=0.42, ocr_letters_min=16):
-    """Delete images that look like text/QR/screenshots."""
-    print_info("Deleting text/QR/screenshot-like images...")
-    deleted_qr = 0
-    deleted_txt = 0
-    for filename in image_files:
-        path = os.path.join(target_dir, filename)
-        if not os.path.isfile(path):
-            continue
-
-        if _has_qr_cv2(path):
-            try:
-                os.remove(path); deleted_qr += 1
-                print_info(f"Deleted QR: {filename}")
-            except Exception as e:
-                print_warning(f"Could not delete {filename}: {e}")
+    print_success(f"Small images: {found}.")
+
+def filter_duplicates(plan):
+    """Delete exact duplicates (byte-identical) across images/gifs/videos).
+    Only same-size files are ever read, and only fully when their first and
+    last 64 KB also match (files.find_duplicates)."""
+    print_info("Checking for exact duplicates...")
+    target_dir = plan.target_dir
+    found = 0
+    for p, orig in find_duplicates([os.path.join(target_dir, f) for f in plan.live()]):
+        plan.delete(os.path.relpath(p, target_dir), "duplicate",
+                    f"duplicate of {os.path.relpath(orig, target_dir)}")
+        found += 1
+    print_success(f"Duplicates: {found}.")
+
+def filter_near_duplicates(plan, max_distance=6, analyzer=None):
+    """
+    Delete near-duplicates: the same picture re-encoded, resized or converted
+    (e.g. 736x JPEG vs originals PNG vs WebP). Images are compared by 64-bit
+    dHash in a BK-tree, largest first, so each group keeps its highest
+    resolution copy. New files are also checked against the images kept in
+    color_images/ and greyscale_images/ by earlier runs (and a kept copy goes
+    if the new one is larger). Hashes persist in the folder's phash index and
+    follow the files when they are sorted, so a re-run only hashes new files.
+    GIFs are left alone.
+    """
+    from .phash import BKTree, PHashIndex
+    print_info("Checking for near-duplicate images...")
+    target_dir = plan.target_dir
+    analyzer = analyzer or ImageAnalyzer(target_dir, ("dhash",))
+    index = PHashIndex(target_dir)
+    files = plan.kept(IMAGE_EXTS)      # colour sorting may already have planned a move
+    for d in KEPT_DIRS:
+        files += [os.path.join(d, rel) for rel in iter_media(os.path.join(target_dir, d), IMAGE_EXTS)]
+
+    known = {}
+    todo = []
+    for f in files:
+        entry = index.get(f)
+        if entry:
+            known[f] = entry
+        else:
+            todo.append(f)
+    analyzer.prefetch(todo, "dhash")
+    for f in todo:
+        res = analyzer.results.get(f, {})
+        if res.get("dhash") and res.get("width"):
+            index.put(f, res["dhash"], res["width"], res["height"])
+            known[f] = (int(res["dhash"], 16), res["width"], res["height"])
+        else:
+            print_warning(f"Could not hash {f}: {res.get('error', 'unreadable image')}")
+
+    def rank(f):
+        entry = index.entries.get(f) or [None, 0, 0, 0]
+        return (known[f][1] * known[f][2], entry[3], f)
+
+    tree = BKTree()
+    found = 0
+    for f in sorted(known, key=rank, reverse=True):
+        h, w, hgt = known[f]
+        if h == 0:
+            continue    # flat image, no gradients to compare: every plain fill would "match"
+        match = tree.search(h, max_distance)
+        if not match:
+            tree.add(h, f)
             continue
-
-        score = _textlike_score_cv2(path)
-        letters = _ocr_letters(path)  # may be None
-        is_textlike = (score >= score_threshold) or (letters is not None and letters >= ocr_letters_min)
-        if is_textlike:
-            try:
-                os.remove(path); deleted_txt += 1
-                why = f"score={score:.2f}" + (f", ocr={letters}" if letters is not None else "")
-                print_info(f"Deleted text-like: {filename} ({why})")
-            except Exception as e:
-                print_warning(f"Could not delete {filename}: {e}")
-    print_success(f"Text/QR deletion done. Deleted {deleted_txt} text-like and {deleted_qr} QR images.")
-
-def filter_by_color(target_dir, image_files):
+        dist, keep = match[0]
+        plan.delete(f, "near_duplicate", f"{w}x{hgt}, {dist} bits from {keep}")
+        index.discard(f)
+        found += 1
+
+    def save():
+        for f, new in plan.moved.items():
+            index.move(f, new)
+        try:
+            index.save()
+        except OSError as e:
+            print_warning(f"Could not save perceptual hash index: {e}")
+    plan.after_apply.append(save)
+    print_success(f"Near-duplicates: {found}.")
+
+def filter_textlike_images(plan, score_threshold=0.42, ocr_letters_min=16, analyzer=None,
+                           ocr_band=0.28, qr_recheck=0.25):
+    """
+    Delete images that look like text/QR/screenshots, cheapest checks first:
+      1. QR + text score on a TEXT_SIZE copy (one reduced decode per image)
+      2. score >= score_threshold            -> text-like, done
+      3. score >= qr_recheck (busy image)    -> QR again at full resolution
+      4. ocr_band <= score < score_threshold -> OCR, batched into few Tesseract runs
+    Images scoring below `ocr_band` are kept without OCR.
+    """
+    import time
+    print_info("Checking for text/QR/screenshot-like images...")
+    analyzer = analyzer or ImageAnalyzer(plan.target_dir, ("qr", "text"))
+    files = plan.live(FILTER_IMAGE_EXTS)
+    stats = {}     # stage -> [images checked, hits, seconds]
+
+    def stage(name, names, run, hit):
+        t0 = time.time()
+        run(names)
+        hits = {f for f in names if hit(analyzer.results[f])}
+        stats[name] = [len(names), len(hits), time.time() - t0]
+        return hits
+
+    qr = stage("qr+score", files, lambda n: analyzer.prefetch(n, "qr"), lambda r: r["qr"])
+    rest = [f for f in files if f not in qr]
+    text = stage("score", rest, lambda n: None, lambda r: r["text_score"] >= score_threshold)
+    rest = [f for f in rest if f not in text]
+    recheck = [f for f in rest if analyzer.results[f]["text_score"] >= qr_recheck]
+    qr |= stage("qr full-res", recheck, lambda n: analyzer.prefetch(n, "qr_full"), lambda r: r["qr_full"])
+    band = [f for f in rest if f not in qr and analyzer.results[f]["text_score"] >= ocr_band]
+    text |= stage("ocr", band, analyzer.ocr,
+                  lambda r: r["ocr_letters"] is not None and r["ocr_letters"] >= ocr_letters_min)
+
+    found_qr = 0
+    found_txt = 0
+    for filename in files:
+        if filename in qr:
+            plan.delete(filename, "qr"); found_qr += 1
+        elif filename in text:
+            res = analyzer.results[filename]
+            letters = res.get("ocr_letters")
+            why = f"score={res['text_score']:.2f}" + (f", ocr={letters}" if letters is not None else "")
+            plan.delete(filename, "textlike", why); found_txt += 1
+    for name, (n, hits, secs) in stats.items():
+        print_info(f"  stage {name}: {n} checked, {hits} hits, {secs:.2f}s")
+    print_success(f"Text-like: {found_txt}, QR: {found_qr}.")
+
+def filter_by_color(plan, mode=None, analyzer=None):
     """
     Sort by color:
       - (b) both -> move color to 'color_images/' and greyish to 'greyscale_images/' (default)
       - (c) keep color in main, move greys to 'greyscale_images/'
       - (g) keep greys in main, move color to 'color_images/'
     Unknown/unanalyzable files are treated as COLOR to be safe.
+    `mode` skips the prompt (batch mode).
     """
-    from colorama import Fore
     print_info("Filter by color")
-    mode = input(
-        Fore.YELLOW + "Choose: (b) sort both [default], (c) keep color in main, (g) keep greyish in main: "
-    ).strip().lower() or 'b'
-
-    color_dir = os.path.join(target_dir, "color_images")
-    grey_dir  = os.path.join(target_dir, "greyscale_images")
-    os.makedirs(color_dir, exist_ok=True)
-    os.makedirs(grey_dir,  exist_ok=True)
+    if mode is None:
+        from colorama import Fore
+        mode = input(
+            Fore.YELLOW + "Choose: (b) sort both [default], (c) keep color in main, (g) keep greyish in main: "
+        ).strip().lower() or 'b'
 
     try:
         import PIL  # noqa: F401
@@ -278,72 +363,53 @@ def filter_by_color(target_dir, image_files):
         PIL_AVAILABLE = False
         print_warning("Pillow not installed; using fallback heuristic. Install with: python -m pip install pillow")
 
-    moved = 0
+    image_files = plan.live(FILTER_IMAGE_EXTS)
+    analyzer = analyzer or ImageAnalyzer(plan.target_dir, ("colour",))
+    if PIL_AVAILABLE:
+        analyzer.prefetch(image_files, "colour")
+    sorted_n = 0
     for filename in image_files:
-        src_path = os.path.join(target_dir, filename)
-        if not os.path.isfile(src_path):
-            continue
-
         if PIL_AVAILABLE:
-            greyish = _is_greyish(src_path)
+            greyish = _is_greyish(analyzer.get(filename, "colour")["colour"])
             if greyish is None:
                 greyish = False  # treat unanalyzable as COLOR to be safe
         else:
             greyish = False
 
-        dest_dir = None
+        dest = None
         if mode == 'b':
-            dest_dir = grey_dir if greyish else color_dir
+            dest = "greyscale_images" if greyish else "color_images"
         elif mode == 'c' and greyish:
-            dest_dir = grey_dir
+            dest = "greyscale_images"
         elif mode == 'g' and not greyish:
-            dest_dir = color_dir
+            dest = "color_images"
         elif mode not in ('b', 'c', 'g'):
-            dest_dir = grey_dir if greyish else color_dir
+            dest = "greyscale_images" if greyish else "color_images"
 
-        if dest_dir:
-            try:
-                final_dest = move_with_increment(src_path, dest_dir)
-                moved += 1
-                print_info(f"Moved {filename} -> {final_dest}")
-            except Exception as e:
-                print_warning(f"Could not move {filename}: {e}")
+        if dest:
+            plan.move(filename, dest)
+            sorted_n += 1
 
-    print_success(f"Color filtering complete. Moved {moved} images.")
+    print_success(f"Color sort: {sorted_n} images to move.")
 
-def move_media_types(target_dir):
+def move_media_types(plan):
     """Move MP4/WebM/MOV/M4V into videos/, GIF into gifs/.
-    Folders are only created if at least one file is moved."""
-    videos_dir = None
-    gifs_dir = None
-    moved_vid = 0
-    moved_gif = 0
-
-    for fname in list(os.listdir(target_dir)):
-        p = os.path.join(target_dir, fname)
-        if not os.path.isfile(p):
-            continue
+    Downloaded videos are already written to videos/ (see files.typed_dir);
+    GIFs are sorted here, after the image filters have seen them. Folders
+    are only created if at least one file is moved."""
+    vids = gifs = 0
+    for fname in plan.live():
         low = fname.lower()
-
         if low.endswith(VIDEO_EXTS):
-            if videos_dir is None:
-                videos_dir = os.path.join(target_dir, "videos")
-            try:
-                move_with_increment(p, videos_dir)
-                moved_vid += 1
-            except Exception as e:
-                print_warning(f"Could not move video {fname}: {e}")
-
+            plan.move(fname, "videos"); vids += 1
         elif low.endswith(GIF_EXTS):
-            if gifs_dir is None:
-                gifs_dir = os.path.join(target_dir, "gifs")
-            try:
-                move_with_increment(p, gifs_dir)
-                moved_gif += 1
-            except Exception as e:
-                print_warning(f"Could not move GIF {fname}: {e}")
+            plan.move(fname, "gifs"); gifs += 1
+    print_success(f"Media types: {vids} videos, {gifs} GIFs to move.")
 
-    print_success(f"Media move complete (videos: {moved_vid}, gifs: {moved_gif}).")
+def plan_leftovers(plan):
+    """Images still at the top level at the end of a run go to color_images/."""
+    for fname in plan.live(IMAGE_EXTS):
+        plan.move(fname, "color_images")
 
 def finalize_color_only(target_dir):
     """
@@ -352,7 +418,8 @@ def finalize_color_only(target_dir):
       - greyscale_images/
       - videos/ (only if contains files)
       - gifs/   (only if contains files)
-    Remove temp folders. Leftover images in root are MOVED to color_images.
+    Remove temp folders and emptied shard folders (leftover images were
+    already planned into color_images/ by plan_leftovers).
     """
     import shutil
 
@@ -366,52 +433,59 @@ def finalize_color_only(target_dir):
             except Exception as e:
                 print_warning(f"Could not remove {dp}: {e}")
 
-    color_dir = os.path.join(target_dir, "color_images")
-    grey_dir  = os.path.join(target_dir, "greyscale_images")
-    os.makedirs(color_dir, exist_ok=True)
-    os.makedirs(grey_dir,  exist_ok=True)
-
-    # Move leftover images in root -> color_images (renumbering if needed)
-    for fname in list(os.listdir(target_dir)):
-        p = os.path.join(target_dir, fname)
-        if not os.path.isfile(p):
-            continue
-        low = fname.lower()
-        if low.endswith(IMAGE_EXTS):
-            try:
-                move_with_increment(p, color_dir)
-            except Exception as e:
-                print_warning(f"Could not move leftover {fname}: {e}")
+    os.makedirs(os.path.join(target_dir, "color_images"), exist_ok=True)
+    os.makedirs(os.path.join(target_dir, "greyscale_images"), exist_ok=True)
+    prune_shards(target_dir)
 
     # If videos/gifs folders exist but are empty, remove them
     for d in ("videos", "gifs"):
         dp = os.path.join(target_dir, d)
         if os.path.isdir(dp):
             try:
-                has_files = any(os.path.isfile(os.path.join(dp, f)) for f in os.listdir(dp))
+                has_files = any(True for _ in iter_media(dp, exts=None))
                 if not has_files:
                     shutil.rmtree(dp)
                     print_info(f"Removed empty folder: {dp}")
             except Exception as e:
                 print_warning(f"Could not inspect/remove {dp}: {e}")
 
-def filter_downloaded_images(target_dir):
-    """Run one or many filters. Accepts comma/space separated choices."""
+EVERYTHING = ["1", "2", "4", "3", "6"]     # option 5 / "all"
+
+def parse_filter_choices(raw):
+    """Turn '1 3 4' / '1,3,4' / '5' / 'all' (or a list of codes) into an ordered filter sequence."""
+    if isinstance(raw, (list, tuple)):
+        raw = ",".join(str(t) for t in raw)
+    import re
+    tokens = []
+    for t in re.split(r"[,\s]+", (raw or "").strip().lower()):
+        tokens += EVERYTHING if t in ("5", "all") else [t]
+    seen = set()
+    return [t for t in tokens if t in {"1","2","3","4","6","7"} and not (t in seen or seen.add(t))]
+
+def filter_downloaded_images(target_dir, choices=None, color_mode=None, dry_run=False):
+    """Run one or many filters. Accepts comma/space separated choices.
+
+    Pass `choices` (and optionally `color_mode`) to run without prompting.
+    With `dry_run`, only report what would be deleted and moved. Returns the
+    FilterPlan, or None when nothing ran.
+    """
     if not os.path.exists(target_dir):
         print_warning("No images to filter!")
         return
 
-    def list_images():
-        return [f for f in os.listdir(target_dir) if f.lower().endswith(('.jpg','.jpeg','.png','.webp','.gif'))]
-
-    def list_all_media():
-        return [f for f in os.listdir(target_dir) if f.lower().endswith(ALL_EXTS)]
-
-    image_files = list_images()
+    plan = FilterPlan(target_dir)      # the run's only scan of the folder
+    image_files = plan.live(FILTER_IMAGE_EXTS)
     if not image_files:
         print_warning("No image files found to filter!")
         return
 
+    if choices is not None:
+        seq = parse_filter_choices(choices)
+        if not seq:
+            print_info("Skipping image filtering")
+            return
+        return apply_selected_filters(seq, target_dir, color_mode=color_mode, dry_run=dry_run, plan=plan)
+
     from colorama import Fore
     print_info(f"Found {len(image_files)} downloaded images")
     print_info("Image filtering options (multi-select allowed, e.g. 1,3,4):")
@@ -420,6 +494,7 @@ def filter_downloaded_images(target_dir):
     print(Fore.CYAN + "3. Filter by color (sort -> color_images / greyscale_images)")
     print(Fore.CYAN + "4. Delete text/QR/screenshot-like images (images only)")
     print(Fore.CYAN + "6. Move MP4/WebM to videos/ and GIF to gifs/")
+    print(Fore.CYAN + "7. Delete near-duplicates (same picture at another size/format; keeps the largest)")
     print(Fore.CYAN + "5. EVERYTHING: 1 -> 2 -> 4 -> 3 -> 6 -> cleanup")
 
     raw = input(Fore.YELLOW + "Choose (e.g. 1 3 4 | 1,3,4 | 5): ").strip().lower()
@@ -427,29 +502,27 @@ def filter_downloaded_images(target_dir):
         print_info("Skipping image filtering")
         return
 
-    if raw in ("5", "all"):
-        seq = ["1", "2", "4", "3", "6"]
-    else:
-        import re
-        tokens = [t for t in re.split(r"[,\s]+", raw) if t]
-        seen = set()
-        seq = [t for t in tokens if t in {"1","2","3","4","6"} and not (t in seen or seen.add(t))]
-
-    apply_selected_filters(seq, target_dir)
+    return apply_selected_filters(parse_filter_choices(raw), target_dir, color_mode=color_mode, dry_run=dry_run,
+                                  plan=plan)
 
-def apply_selected_filters(seq, target_dir):
-    """Apply a sequence like ['1','3','4'] with state refreshed between steps."""
-    def list_images():
-        return [f for f in os.listdir(target_dir) if f.lower().endswith(('.jpg','.jpeg','.png','.webp','.gif'))]
-    def list_all_media():
-        return [f for f in os.listdir(target_dir) if f.lower().endswith(ALL_EXTS)]
+def apply_selected_filters(seq, target_dir, color_mode=None, dry_run=False, plan=None):
+    """Apply a sequence like ['1','3','4'] and return the FilterPlan.
 
+    The folder is scanned once (or `plan`, a fresh FilterPlan for it, is used); each step sees only the files earlier steps
+    left in place, and the combined verdicts are applied in a single pass at
+    the end (or just reported, with `dry_run`). One ImageAnalyzer is shared
+    by all steps, so each image is decoded at most once for every feature
+    the sequence needs.
+    """
+    plan = plan or FilterPlan(target_dir)
+    analyzer = ImageAnalyzer(target_dir, features_for(seq), cache=open_cache(ANALYZER_VERSION))
     actions = {
-        "1": lambda: filter_small_images(target_dir, list_images()),
-        "2": lambda: filter_duplicates(target_dir, list_all_media()),
-        "3": lambda: filter_by_color(target_dir, list_images()),
-        "4": lambda: filter_textlike_images(target_dir, list_images()),
-        "6": lambda: move_media_types(target_dir),
+        "1": lambda: filter_small_images(plan, analyzer=analyzer),
+        "2": lambda: filter_duplicates(plan),
+        "3": lambda: filter_by_color(plan, mode=color_mode, analyzer=analyzer),
+        "4": lambda: filter_textlike_images(plan, analyzer=analyzer),
+        "6": lambda: move_media_types(plan),
+        "7": lambda: filter_near_duplicates(plan, analyzer=analyzer),
     }
 
     ran_any = False
@@ -459,13 +532,23 @@ def apply_selected_filters(seq, target_dir):
             continue
         print_info(f"Running filter {code} ...")
         try:
-            actions[code]()
+            with metrics.timer(f"filters.{code}"):
+                actions[code]()
             ran_any = True
         except Exception as e:
             print_error(f"Filter {code} failed: {e}")
 
+    if analyzer.cache is not None and (analyzer.cache.hits or analyzer.cache.misses):
+        print_info(f"Analysis cache: {analyzer.cache.hits} hits, {analyzer.cache.misses} misses")
+    analyzer.close()
+
     if ran_any:
-        finalize_color_only(target_dir)
+        plan_leftovers(plan)
+        if dry_run:
+            plan.preview()
+            return plan
+        with metrics.timer("filters.apply"):
+            plan.apply()
+            finalize_color_only(target_dir)
         print_success("Filters complete and cleaned up.")
-    else:
-        print_info("No valid filters selected.")
+    return plan
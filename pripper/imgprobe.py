@@ -0,0 +1,120 @@
+# pripper/imgprobe.py
+import struct
+
+# Header parsing for image dimensions, so downloads can be judged from the
+# first few KB instead of after the whole file is on disk.
+
+def image_format(head):
+    """'jpeg' | 'png' | 'gif' | 'webp', or None if the bytes are not a known still image."""
+    if head[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+_IMAGE_EXT = {'jpeg': '.jpg', 'png': '.png', 'gif': '.gif', 'webp': '.webp'}
+_QT_ATOMS = (b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot')   # ftyp-less QuickTime
+# ISO-BMFF major brands that mean a video. The same box layout also carries
+# still images (avif, heic, mif1, ...), which must not end up as .mp4.
+_M4V_BRANDS = (b'M4V ', b'M4VH', b'M4VP')
+_MP4_BRANDS = (b'isom', b'iso2', b'iso3', b'iso4', b'iso5', b'iso6', b'mp41', b'mp42', b'mp71',
+               b'avc1', b'dash', b'msdh', b'msix', b'f4v ', b'MSNV', b'NDAS',
+               b'3gp4', b'3gp5', b'3gp6', b'3gp7', b'3g2a')
+
+def media_ext(head):
+    """
+    File extension for the container in `head` (a file's first bytes):
+    .jpg/.png/.gif/.webp, .mp4/.m4v/.mov from the ISO-BMFF ftyp brand,
+    .webm for EBML (Matroska/WebM). None if the bytes are not recognised,
+    including ftyp brands that are not video (AVIF, HEIC, ...).
+    """
+    fmt = image_format(head)
+    if fmt is not None:
+        return _IMAGE_EXT[fmt]
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand == b'qt  ':
+            return '.mov'
+        if brand in _M4V_BRANDS:
+            return '.m4v'
+        if brand in _MP4_BRANDS:
+            return '.mp4'
+        return None
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return '.webm'
+    if head[4:8] in _QT_ATOMS:
+        return '.mov'
+    return None
+
+def _png_size(head):
+    if len(head) < 24 or head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+def _gif_size(head):
+    if len(head) < 10:
+        return None
+    return struct.unpack('<HH', head[6:10])
+
+def _webp_size(head):
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        # lossy: 3-byte frame tag, start code 9d 01 2a, then 14-bit sizes
+        if head[23:26] != b'\x9d\x01\x2a':
+            return None
+        w, h = struct.unpack('<HH', head[26:30])
+        return w & 0x3fff, h & 0x3fff
+    if chunk == b'VP8L':
+        if head[20] != 0x2f:
+            return None
+        bits = struct.unpack('<I', head[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X':
+        w = int.from_bytes(head[24:27], 'little') + 1
+        h = int.from_bytes(head[27:30], 'little') + 1
+        return w, h
+    return None
+
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but don't
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def _jpeg_size(head):
+    i, n = 2, len(head)
+    while i + 4 <= n:
+        if head[i] != 0xFF:
+            return None             # lost sync: corrupt or not a JPEG
+        marker = head[i + 1]
+        if marker == 0xFF:          # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2                  # standalone markers have no length
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            return None             # EOI / start of scan before any SOF
+        seg_len = struct.unpack('>H', head[i + 2:i + 4])[0]
+        if marker in _JPEG_SOF:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack('>HH', head[i + 5:i + 9])
+            return w, h
+        i += 2 + seg_len
+    return None
+
+_PARSERS = {'jpeg': _jpeg_size, 'png': _png_size, 'gif': _gif_size, 'webp': _webp_size}
+
+def probe_dimensions(head):
+    """(width, height) from the leading bytes of an image, or None if not (yet) known."""
+    fmt = image_format(head)
+    if fmt is None:
+        return None
+    try:
+        return _PARSERS[fmt](head)
+    except (struct.error, IndexError):
+        return None
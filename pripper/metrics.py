@@ -0,0 +1,204 @@
+# pripper/metrics.py
+import os
+import json
+import time
+import threading
+
+from .config import METRICS_REPORT, METRICS_PROM, METRICS_TRACE_MAX
+
+# Run-wide instrumentation: counters (events and byte totals), latency
+# histograms and one trace per media item, from discovery to its final
+# file. Everything is a no-op until enable() is called, so instrumented
+# hot paths pay one global check when metrics are off.
+#
+# Names are "<stage>.<what>" (e.g. net.fetch, filters.4); byte counters end
+# in "_bytes"; timers record seconds.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_on = False
+_lock = threading.Lock()
+_started = None
+_counters = {}
+_hists = {}         # name -> [count, sum, min, max, bucket counts...]
+_traces = {}        # url -> [[t, event, fields], ...]
+_files = {}         # abspath -> url, so filters can extend a download's trace
+_dropped_traces = 0
+_paths = (None, None)
+
+def enable(report=None, prom=None):
+    """Start collecting. `report`/`prom` are where finish() writes (config defaults otherwise)."""
+    global _on, _started, _paths
+    with _lock:
+        _counters.clear()
+        _hists.clear()
+        _traces.clear()
+        _files.clear()
+        _started = time.time()
+        _paths = (report or METRICS_REPORT, prom or METRICS_PROM)
+        _on = True
+
+def enabled():
+    return _on
+
+def count(name, n=1):
+    if not _on:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def observe(name, seconds):
+    if not _on:
+        return
+    with _lock:
+        h = _hists.get(name)
+        if h is None:
+            h = _hists[name] = [0, 0.0, seconds, seconds] + [0] * (len(BUCKETS) + 1)
+        h[0] += 1
+        h[1] += seconds
+        h[2] = min(h[2], seconds)
+        h[3] = max(h[3], seconds)
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h[4 + i] += 1
+                break
+        else:
+            h[-1] += 1
+
+class _Timer:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL = _NullTimer()
+
+def timer(name):
+    """Context manager recording the block's duration under `name`."""
+    return _Timer(name) if _on else _NULL
+
+def trace(url, event, **fields):
+    """Append `event` to the trace of the media item fetched from `url`."""
+    global _dropped_traces
+    if not _on or not url:
+        return
+    with _lock:
+        events = _traces.get(url)
+        if events is None:
+            if len(_traces) >= METRICS_TRACE_MAX:
+                _dropped_traces += 1
+                return
+            events = _traces[url] = []
+        events.append([round(time.time() - _started, 4), event, fields] if fields
+                      else [round(time.time() - _started, 4), event])
+
+def link_file(path, url):
+    """Record that `path` holds the media from `url` (for trace_file)."""
+    if not _on or not url:
+        return
+    with _lock:
+        _files[os.path.abspath(path)] = url
+
+def trace_file(path, event, **fields):
+    """Extend the trace of whatever item `path` holds; a 'to' field re-points it after a move."""
+    if not _on:
+        return
+    key = os.path.abspath(path)
+    with _lock:
+        url = _files.get(key)
+        if url is not None and "to" in fields:
+            _files[os.path.abspath(fields["to"])] = _files.pop(key)
+    if url is not None:
+        trace(url, event, **fields)
+
+# --------- Reports ----------
+def _quantile(h, q):
+    """Estimate a quantile from bucket counts (upper bound of the bucket it falls in)."""
+    target = q * h[0]
+    seen = 0
+    for i, b in enumerate(BUCKETS):
+        seen += h[4 + i]
+        if seen >= target:
+            return min(b, h[3])
+    return h[3]
+
+def snapshot():
+    """Current metrics as a JSON-ready dict."""
+    with _lock:
+        hists = {}
+        for name, h in sorted(_hists.items()):
+            hists[name] = {
+                "count": h[0], "sum": round(h[1], 6), "min": round(h[2], 6), "max": round(h[3], 6),
+                "mean": round(h[1] / h[0], 6) if h[0] else None,
+                "p50": _quantile(h, 0.5), "p95": _quantile(h, 0.95),
+                "buckets": {str(b): c for b, c in zip(BUCKETS + ("+Inf",), h[4:])},
+            }
+        return {
+            "started": _started,
+            "duration_s": round(time.time() - _started, 3) if _started else 0.0,
+            "counters": dict(sorted(_counters.items())),
+            "histograms": hists,
+            "traces": [{"url": u, "events": ev} for u, ev in _traces.items()],
+            "traces_dropped": _dropped_traces,
+        }
+
+def _prom_name(name):
+    return "pripper_" + "".join(c if c.isalnum() else "_" for c in name)
+
+def prometheus_text(snap=None):
+    """Prometheus text exposition of the counters and histograms (no traces)."""
+    snap = snap or snapshot()
+    lines = []
+    for name, value in snap["counters"].items():
+        metric = _prom_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, h in snap["histograms"].items():
+        metric = _prom_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for le, c in h["buckets"].items():
+            cumulative += c
+            lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+        lines += [f"{metric}_sum {h['sum']}", f"{metric}_count {h['count']}"]
+    lines += ["# TYPE pripper_run_duration_seconds gauge", f"pripper_run_duration_seconds {snap['duration_s']}"]
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)     # textfile collectors must never see a half-written file
+
+def finish():
+    """Write the JSON report and/or Prometheus textfile chosen in enable(), then stop collecting."""
+    global _on
+    if not _on:
+        return
+    snap = snapshot()
+    report, prom = _paths
+    _on = False
+    from .utils import print_info, print_warning
+    try:
+        if report:
+            _write_atomic(report, json.dumps(snap, indent=1))
+            print_info(f"Metrics report written to {report}")
+        if prom:
+            _write_atomic(prom, prometheus_text(snap))
+            print_info(f"Prometheus metrics written to {prom}")
+    except OSError as e:
+        print_warning(f"Could not write metrics: {e}")
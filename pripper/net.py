@@ -1,29 +1,97 @@
 # pripper/net.py
 import os
 import hashlib
-import requests
 import concurrent.futures
 
-from .utils import print_success
-from .config import MIN_IMAGE_BYTES, ALL_EXTS, MAX_WORKERS
+from . import metrics, progress
+from .config import MIN_IMAGE_BYTES, MIN_IMAGE_PIXELS, PROBE_BYTES, ALL_EXTS, MAX_WORKERS
+from .files import hash_existing_files, index_allocator, typed_dir
 
 def _requests_session():
+    import requests
     s = requests.Session()
     s.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'})
     return s
 
-def _fetch_bytes(url, session, timeout=12):
+# --------- Pre-write filters ----------
+# A prefilter is called as f(head_bytes, content_type, url) while a download
+# streams in and returns True (keep), False (reject: transfer is cancelled,
+# nothing is written) or None (undecided, look again with more bytes).
+# Anything still undecided after PROBE_BYTES is kept.
+
+def min_dimensions_prefilter(min_pixels=MIN_IMAGE_PIXELS):
+    """Reject still images whose header says either side is below `min_pixels`."""
+    from .imgprobe import image_format, probe_dimensions
+
+    def check(head, ctype, url):
+        if len(head) >= 12 and image_format(head) is None:
+            return True         # video or unknown container: not ours to judge
+        dims = probe_dimensions(head)
+        if dims is None:
+            return None
+        w, h = dims
+        return w >= min_pixels and h >= min_pixels
+    return check
+
+def _run_prefilters(prefilters, head, ctype, url):
+    """Combined verdict: False if any rejects, None while any is undecided, else True."""
+    verdict = True
+    for f in prefilters:
+        v = f(head, ctype, url)
+        if v is False:
+            return False
+        if v is None:
+            verdict = None
+    return verdict
+
+def _fetch_bytes(url, session, timeout=12, prefilters=None):
+    """(data, content type, outcome) for `url`, recorded in the metrics; see _fetch for the outcomes."""
+    with metrics.timer("net.fetch"):
+        data, ctype, outcome = _fetch(url, session, timeout, prefilters)
+    metrics.count(f"net.{outcome}")
+    if data is not None:
+        metrics.count("net.fetched_bytes", len(data))
+        metrics.trace(url, outcome, bytes=len(data))
+    else:
+        metrics.trace(url, outcome)
+    return data, ctype, outcome
+
+def _fetch(url, session, timeout, prefilters):
+    """(data, content type, outcome) where outcome is fetched / http_error / prefilter_rejected / too_small / error."""
     try:
-        r = session.get(url, timeout=timeout)
-        if r.status_code != 200:
-            return None, None
-        data = r.content
+        if not prefilters:
+            r = session.get(url, timeout=timeout)
+            if r.status_code != 200:
+                return None, None, "http_error"
+            data = r.content
+        else:
+            with session.get(url, timeout=timeout, stream=True) as r:
+                if r.status_code != 200:
+                    return None, None, "http_error"
+                ctype = r.headers.get('content-type', '')
+                chunks, size, decided = [], 0, False
+                for chunk in r.iter_content(chunk_size=16384):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if not decided:
+                        head = b''.join(chunks)
+                        verdict = _run_prefilters(prefilters, head, ctype, url)
+                        if verdict is False:
+                            # closing the response drops the rest of the transfer
+                            return None, None, "prefilter_rejected"
+                        decided = verdict is True or size >= PROBE_BYTES
+                data = b''.join(chunks)
         if not data or len(data) < MIN_IMAGE_BYTES:
-            return None, None
+            return None, None, "too_small"
         ctype = r.headers.get('content-type', '')
-        return data, ctype
+        return data, ctype, "fetched"
     except Exception:
-        return None, None
+        return None, None, "error"
+
+def _media_ext(data, ctype, url):
+    """Extension for downloaded bytes: the container sniffed from the first bytes, else a guess from headers/URL."""
+    from .imgprobe import media_ext
+    return media_ext(data[:32]) or _ext_from_ctype_or_url(ctype, url)
 
 def _ext_from_ctype_or_url(ctype, url):
     if ctype:
@@ -40,10 +108,21 @@ def _ext_from_ctype_or_url(ctype, url):
         return ext
     return '.jpg'
 
-def download_images_concurrent(urls, target_dir, existing_hashes, start_idx, max_workers=MAX_WORKERS):
-    """Fetch multiple media concurrently, write sequential filenames in main thread."""
+def download_images_concurrent(urls, target_dir, existing_hashes, max_workers=MAX_WORKERS,
+                               budget=None, prefilters=None, store=None):
+    """Fetch multiple media concurrently, write sequential filenames in main thread.
+
+    Filenames come from the directory's IndexAllocator, so concurrent jobs
+    and workers writing into the same folder never collide.
+
+    `budget` is an optional semaphore shared between concurrent jobs; each fetch
+    holds one slot, so the total number of in-flight downloads stays bounded.
+    `prefilters` are checked against the first bytes of each download (see above).
+    With a ContentStore, URLs it has seen are not fetched again and every new
+    file is a hardlink to the store's copy.
+    """
     if not urls:
-        return 0, 0, start_idx
+        return 0, 0
 
     session = _requests_session()
     count = 0
@@ -51,33 +130,78 @@ def download_images_concurrent(urls, target_dir, existing_hashes, start_idx, max
     results = []
 
     def worker(url):
-        data, ctype = _fetch_bytes(url, session)
+        if store is not None:
+            hit = store.lookup_url(url)
+            if hit is not None:
+                metrics.count("net.store_hit")
+                metrics.trace(url, "store_hit")
+                return (url, None, hit[1], hit[0])     # known content: no fetch
+        if budget is not None:
+            with metrics.timer("net.budget_wait"):
+                budget.acquire()
+            try:
+                data, ctype, _ = _fetch_bytes(url, session, prefilters=prefilters)
+            finally:
+                budget.release()
+        else:
+            data, ctype, _ = _fetch_bytes(url, session, prefilters=prefilters)
         if not data:
             return (url, None, None, None)
-        h = hashlib.sha256(data).hexdigest()
-        return (url, data, ctype, h)
+        with metrics.timer("net.hash"):
+            h = hashlib.sha256(data).hexdigest()
+        return (url, data, _media_ext(data, ctype, url), h)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-        for url, data, ctype, h in ex.map(worker, urls):
-            if not data:
+    with progress.Progress("Downloading", total=len(urls)) as prog, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for url, data, ext, h in ex.map(worker, urls):
+            prog.advance(1, len(data) if data else 0)
+            if h is None:
                 skipped += 1
                 continue
             if h in existing_hashes:
+                if store is not None and data is not None:
+                    store.put(data, ext, url=url, sha256=h)   # remember the URL for other boards
+                metrics.count("net.duplicate")
+                metrics.trace(url, "duplicate")
                 skipped += 1
                 continue
-            results.append((url, data, ctype, h))
+            results.append((url, data, ext, h))
 
-    next_idx = start_idx
     os.makedirs(target_dir, exist_ok=True)
-    for url, data, ctype, h in results:
-        ext = _ext_from_ctype_or_url(ctype, url)
-        fname = f"image_{next_idx}{ext}"
-        out_path = os.path.join(target_dir, fname)
-        with open(out_path, 'wb') as f:
-            f.write(data)
+    for url, data, ext, h in results:
+        if h in existing_hashes:    # same content under two URLs in this batch
+            if store is not None and data is not None:
+                store.put(data, ext, url=url, sha256=h)
+            metrics.count("net.duplicate")
+            metrics.trace(url, "duplicate")
+            skipped += 1
+            continue
+        dest = typed_dir(target_dir, ext)
+        with metrics.timer("files.write"):
+            if store is None:
+                fname = index_allocator(dest).write_new(data, ext)
+            else:
+                if data is not None:
+                    store.put(data, ext, url=url, sha256=h)
+                fname = store.link(h, dest, ext)
+        fname = os.path.relpath(os.path.join(dest, fname), target_dir)
+        if data is None:
+            progress.log(f"Linked from store: {fname} <- {url}")
+        else:
+            progress.log(f"Downloaded: {fname} ({len(data)} bytes) <- {url}")
+            metrics.count("files.written_bytes", len(data))
+        metrics.count("files.written")
+        metrics.trace(url, "written", file=fname)
+        metrics.link_file(os.path.join(target_dir, fname), url)
         existing_hashes.add(h)
-        print_success(f"Downloaded: {fname} ({len(data)} bytes)")
-        next_idx += 1
         count += 1
 
-    return count, skipped, next_idx
+    return count, skipped
+
+def download_to_dir(urls, target_dir, budget=None, prefilters=None, store=None):
+    """Download `urls` into `target_dir`, skipping content already present there."""
+    os.makedirs(target_dir, exist_ok=True)
+    existing_hashes = hash_existing_files(target_dir)
+    count, skipped = download_images_concurrent(urls, target_dir, existing_hashes, budget=budget,
+                                                prefilters=prefilters, store=store)
+    return count, skipped
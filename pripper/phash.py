@@ -0,0 +1,105 @@
+# pripper/phash.py
+import os
+import json
+
+INDEX_NAME = ".pripper_phash.json"
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """
+    Burkhard–Keller tree over 64-bit hashes with Hamming distance. A radius
+    query only descends into children whose edge distance lies within
+    [d - radius, d + radius], so lookups touch a small part of the tree
+    instead of every stored hash.
+    """
+
+    def __init__(self):
+        self.root = None    # [hash, item, {distance: child}]
+        self.size = 0
+
+    def add(self, h, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [h, item, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, item, {}]
+                return
+            node = child
+
+    def search(self, h, radius):
+        """[(distance, item)] for every stored hash within `radius` of `h`, nearest first."""
+        out = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.append((d, node[1]))
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        out.sort(key=lambda t: t[0])
+        return out
+
+class PHashIndex:
+    """
+    Per-directory record of {relpath: (dhash, width, height)} kept next to
+    the media as INDEX_NAME, for the top level and the sorted subfolders
+    alike. Entries are validated against file size and mtime, so only new or
+    changed files need hashing on the next run; move() keeps an entry with
+    its file when a filter run sorts it elsewhere.
+    """
+
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        self.path = os.path.join(target_dir, INDEX_NAME)
+        self.entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _stamp(self, filename):
+        st = os.stat(os.path.join(self.target_dir, filename))
+        return [st.st_size, st.st_mtime_ns]
+
+    def get(self, filename):
+        """(dhash int, width, height) if the entry is still valid for the file on disk."""
+        e = self.entries.get(filename)
+        try:
+            if e and e[3:5] == self._stamp(filename):
+                return int(e[0], 16), e[1], e[2]
+        except OSError:
+            pass
+        return None
+
+    def put(self, filename, dhash_hex, width, height):
+        try:
+            self.entries[filename] = [dhash_hex, width, height] + self._stamp(filename)
+        except OSError:
+            pass
+
+    def discard(self, filename):
+        self.entries.pop(filename, None)
+
+    def move(self, filename, new_filename):
+        e = self.entries.pop(filename, None)
+        if e is not None:
+            self.entries[new_filename] = e
+
+    def save(self):
+        # drop entries for files that are gone, then write atomically
+        self.entries = {f: e for f, e in self.entries.items()
+                        if os.path.isfile(os.path.join(self.target_dir, f))}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
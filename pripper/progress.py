@@ -0,0 +1,167 @@
+# pripper/progress.py
+import sys
+import time
+import atexit
+import threading
+from colorama import Fore
+
+from . import utils
+from .config import PROGRESS_INTERVAL, PROGRESS_LOG_INTERVAL, VERBOSE_LOG
+
+# Long loops (downloads, filters) report through a Progress instead of one
+# coloured line per file: the terminal gets a single throttled status line
+# (items/s, bytes/s, ETA), and per-file detail goes to the buffered
+# verbose log, which is only written when VERBOSE_LOG / --log is set.
+
+_log_path = VERBOSE_LOG
+_log = None
+_log_lock = threading.Lock()
+
+def set_log(path):
+    """Send per-file detail to `path` (None = discard it)."""
+    global _log_path
+    close_log()
+    _log_path = path
+
+def log(msg):
+    """Append one detail line to the verbose log, if there is one."""
+    global _log
+    if not _log_path:
+        return
+    with _log_lock:
+        if _log is None:
+            _log = open(_log_path, "a", encoding="utf-8", buffering=1 << 16)
+        _log.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg}\n")
+
+def close_log():
+    global _log
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+            _log = None
+
+atexit.register(close_log)
+
+def _fmt_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1000:
+            return f"{n:.1f} {unit}"
+        n /= 1000
+    return f"{n:.1f} TB"
+
+def _fmt_eta(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+# Every active Progress in the process shares one status line (joined with
+# " | "), so concurrent batch jobs don't draw over each other. Log lines
+# printed meanwhile clear it first (utils calls clear_line) and it comes
+# back on the next redraw.
+_active = []
+_draw_lock = threading.RLock()
+_drawn = 0          # width of the in-place line on screen (0 = none)
+_next = 0.0         # when the shared line is due for a redraw
+
+def _output():
+    stream = utils.LOG_STREAM or sys.stdout
+    try:
+        return stream, stream.isatty()
+    except Exception:
+        return stream, False
+
+def _due(tty, now):
+    interval = PROGRESS_INTERVAL if tty else PROGRESS_LOG_INTERVAL
+    return now + interval if interval else float("inf")
+
+def _render():
+    global _drawn, _next
+    with _draw_lock:
+        if not _active:
+            return
+        stream, tty = _output()
+        line = "[*] " + " | ".join(p._line() for p in _active)
+        if tty:
+            stream.write("\r" + Fore.CYAN + line.ljust(_drawn))
+            _drawn = max(len(line), 1)
+        else:
+            stream.write(Fore.CYAN + line + "\n")
+        stream.flush()
+        for p in _active:
+            p._shown = True
+        _next = _due(tty, time.monotonic())
+
+def clear_line():
+    """Blank the in-place status line (before something else is printed)."""
+    global _drawn
+    with _draw_lock:
+        if _drawn:
+            stream, _ = _output()
+            stream.write("\r" + " " * _drawn + "\r")
+            stream.flush()
+            _drawn = 0
+
+utils._clear_status = clear_line
+
+class Progress:
+    """
+    Throttled status for a loop over `total` items (None = unknown), drawn
+    into the shared status line. advance() only updates counters unless a
+    redraw is due: every PROGRESS_INTERVAL seconds in place on a terminal,
+    every PROGRESS_LOG_INTERVAL seconds as a plain line when output is piped.
+    Nothing is drawn for loops that finish before the first redraw; the
+    caller's summary line covers those. Each instance is advanced from one
+    thread; several may run at once.
+    """
+
+    def __init__(self, label, total=None, unit="files"):
+        global _next
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._shown = False     # part of a line that was drawn
+        with _draw_lock:
+            if not _active:
+                _, tty = _output()
+                _next = _due(tty, self.started)
+            _active.append(self)
+
+    def advance(self, n=1, nbytes=0):
+        self.done += n
+        self.bytes += nbytes
+        if time.monotonic() >= _next:
+            _render()
+
+    def _line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.done / elapsed
+        parts = [f"{self.label} {self.done}/{self.total}" if self.total else f"{self.label} {self.done}"]
+        if self.total:
+            parts[0] += f" ({100 * self.done // max(self.total, 1)}%)"
+        parts.append(f"{rate:.1f} {self.unit}/s")
+        if self.bytes:
+            parts.append(f"{_fmt_bytes(self.bytes / elapsed)}/s")
+        if self.total and rate > 0 and self.done < self.total:
+            parts.append(f"ETA {_fmt_eta((self.total - self.done) / rate)}")
+        return "  ".join(parts)
+
+    def close(self):
+        """Leave the shared line; on a terminal, its final state stays on a line of its own."""
+        with _draw_lock:
+            if self in _active:
+                _active.remove(self)
+            stream, tty = _output()
+            if self._shown and tty:
+                clear_line()
+                stream.write(Fore.CYAN + "[*] " + self._line() + "\n")
+                stream.flush()
+                self._shown = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
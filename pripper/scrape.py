@@ -1,9 +1,6 @@
 # pripper/scrape.py
 import os
 import time
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from .config import (
     ADVANCED_DELAY,
@@ -13,35 +10,63 @@ from .config import (
 )
 from .browser import is_avatar_image, scroll_page
 from .utils import print_info, print_success, print_warning, print_error
-from .files import get_next_index
+from .files import hash_existing_files
 from .net import download_images_concurrent
+from . import metrics
 
-def scroll_and_download_realtime(driver, target_dir):
-    """Scroll page and download media per scroll in batches (concurrent)."""
+def scroll_and_download_realtime(driver, target_dir, budget=None, exporter=None, prefilters=None, store=None):
+    """Scroll page and download media per scroll in batches (concurrent).
+
+    With an `exporter`, discovered URLs are streamed to it instead of being
+    downloaded, and the number of exported items is returned.
+    """
+    if exporter is not None:
+        return _scroll_and_export(driver, exporter)
     os.makedirs(target_dir, exist_ok=True)
 
     # dedupe by content hashes of existing files
-    import hashlib
-    existing_hashes = set()
-    if os.path.exists(target_dir):
-        for fname in os.listdir(target_dir):
-            path = os.path.join(target_dir, fname)
-            if os.path.isfile(path):
-                try:
-                    with open(path, 'rb') as f:
-                        existing_hashes.add(hashlib.sha256(f.read()).hexdigest())
-                except Exception:
-                    pass
-
-    next_idx = get_next_index(target_dir)
+    existing_hashes = hash_existing_files(target_dir)
+
     downloaded_count = 0
     avatar_count = 0
     processed_urls = set()
 
+    for batch_urls, scroll_avatars in _scroll_batches(driver, processed_urls):
+        avatar_count += scroll_avatars
+        # Download batch concurrently
+        if batch_urls:
+            got, skipped = download_images_concurrent(batch_urls, target_dir, existing_hashes,
+                                                      budget=budget, prefilters=prefilters, store=store)
+            downloaded_count += got
+            if got or scroll_avatars:
+                print_info(f"  This scroll: {got} downloaded, {scroll_avatars} avatars skipped")
+
+    print_success("Real-time download complete!")
+    print_info(f"  Total files downloaded: {downloaded_count}")
+    print_info(f"  Avatars filtered out: {avatar_count}")
+    return downloaded_count
+
+
+def _scroll_and_export(driver, exporter):
+    """Basic-mode discovery only: stream each batch to `exporter` as it is found."""
+    exported = 0
+    avatar_count = 0
+    for batch_urls, scroll_avatars in _scroll_batches(driver, set()):
+        avatar_count += scroll_avatars
+        exported += sum(1 for u in batch_urls if exporter.emit(u))
+    print_success(f"Export complete! {exported} media URLs written.")
+    print_info(f"  Avatars filtered out: {avatar_count}")
+    return exported
+
+
+def _scroll_batches(driver, processed_urls):
+    """Scroll the page, yielding (new media URLs, avatars skipped) once per scroll."""
+    from selenium.webdriver.common.by import By
     last_height = driver.execute_script("return document.body.scrollHeight")
 
     for i in range(MAX_SCROLLS):
         print_info(f"Scroll {i+1}/{MAX_SCROLLS} - Collecting media...")
+        t0 = time.perf_counter()
 
         all_images = driver.find_elements(By.TAG_NAME, 'img')
         scroll_avatars = 0
@@ -55,7 +80,6 @@ def scroll_and_download_realtime(driver, target_dir):
                 processed_urls.add(src)
 
                 if is_avatar_image(img, driver):
-                    avatar_count += 1
                     scroll_avatars += 1
                     continue
 
@@ -86,15 +110,17 @@ def scroll_and_download_realtime(driver, target_dir):
         except Exception:
             pass
 
-        # Download batch concurrently
-        if batch_urls:
-            got, skipped, next_idx = download_images_concurrent(batch_urls, target_dir, existing_hashes, next_idx)
-            downloaded_count += got
-            if got or scroll_avatars:
-                print_info(f"  This scroll: {got} downloaded, {scroll_avatars} avatars skipped")
+        metrics.observe("scrape.collect", time.perf_counter() - t0)
+        metrics.count("scrape.scrolls")
+        metrics.count("scrape.discovered", len(batch_urls))
+        metrics.count("scrape.avatars_skipped", scroll_avatars)
+        for u in batch_urls:
+            metrics.trace(u, "discovered", scroll=i + 1)
+        yield batch_urls, scroll_avatars
 
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(SCROLL_PAUSE)
+        with metrics.timer("scrape.scroll"):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(SCROLL_PAUSE)
 
         new_height = driver.execute_script("return document.body.scrollHeight")
         if new_height == last_height:
@@ -108,13 +134,9 @@ def scroll_and_download_realtime(driver, target_dir):
             driver.execute_script("window.scrollBy(0, 400);")
             time.sleep(0.2)
 
-    print_success("Real-time download complete!")
-    print_info(f"  Total files downloaded: {downloaded_count}")
-    print_info(f"  Avatars filtered out: {avatar_count}")
-    return downloaded_count
-
 
 def extract_pin_links(driver):
+    from selenium.webdriver.common.by import By
     pin_links = set()
     selectors = [
         'a[href*="/pin/"]:not([href*="/search/pins/"])',
@@ -147,6 +169,9 @@ def extract_pin_links(driver):
 
 
 def extract_image_from_pin_page(driver, pin_url):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     try:
         driver.get(pin_url)
         wait = WebDriverWait(driver, 10)
@@ -176,6 +201,7 @@ def extract_image_from_pin_page(driver, pin_url):
 
 def extract_video_from_pin_page(driver):
     """Try to get a video URL (mp4/webm/mov) from the current pin page."""
+    from selenium.webdriver.common.by import By
     try:
         vids = driver.find_elements(By.TAG_NAME, 'video')
         for v in vids:
@@ -208,6 +234,7 @@ def extract_video_from_pin_page(driver):
 
 
 def extract_image_urls_basic(driver):
+    from selenium.webdriver.common.by import By
     urls = set()
     for img in driver.find_elements(By.CSS_SELECTOR, 'img[src*="pinimg.com"]'):
         try:
@@ -221,7 +248,9 @@ def extract_image_urls_basic(driver):
     return list(urls)
 
 
-def extract_image_urls_advanced(driver, original_url):
+def extract_image_urls_advanced(driver, original_url, exporter=None):
+    """Collect media from the board and every pin page; each find is also
+    streamed to `exporter` (if given) as soon as it is discovered."""
     print_info("Advanced mode: Starting comprehensive extraction...")
     driver.get(original_url)
     time.sleep(2.5)
@@ -230,21 +259,33 @@ def extract_image_urls_advanced(driver, original_url):
     print_info("Phase 1: Extracting basic images...")
     basic_urls = extract_image_urls_basic(driver)
     print_success(f"Basic extraction: {len(basic_urls)} images found")
+    if exporter is not None:
+        for u in basic_urls:
+            exporter.emit(u)
 
     print_info("Phase 2: Extracting pin links...")
     pin_links = extract_pin_links(driver)
     print_info(f"Found {len(pin_links)} individual pins")
 
     all_urls = set(basic_urls)
+    metrics.count("scrape.discovered", len(basic_urls))
+    for u in basic_urls:
+        metrics.trace(u, "discovered")
 
     if pin_links:
         print_info("Phase 3: Processing individual pins for high-quality media...")
         for i, pin_url in enumerate(pin_links):
             print_info(f"Processing pin {i+1}/{len(pin_links)}: {os.path.basename(pin_url)}")
+            metrics.count("scrape.pins")
 
-            image_url = extract_image_from_pin_page(driver, pin_url)
+            with metrics.timer("scrape.pin_page"):
+                image_url = extract_image_from_pin_page(driver, pin_url)
             if image_url:
+                metrics.count("scrape.discovered")
+                metrics.trace(image_url, "discovered", pin=pin_url)
                 all_urls.add(image_url)
+                if exporter is not None:
+                    exporter.emit(image_url, pin_url=pin_url)
                 print_success(f"Found high-quality image: {os.path.basename(image_url)}")
             else:
                 print_warning(f"No main image found for pin: {pin_url}")
@@ -252,7 +293,11 @@ def extract_image_urls_advanced(driver, original_url):
             try:
                 video_url = extract_video_from_pin_page(driver)
                 if video_url:
+                    metrics.count("scrape.discovered")
+                    metrics.trace(video_url, "discovered", pin=pin_url)
                     all_urls.add(video_url)
+                    if exporter is not None:
+                        exporter.emit(video_url, pin_url=pin_url)
                     print_success(f"Found video: {os.path.basename(video_url)}")
             except Exception:
                 pass
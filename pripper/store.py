@@ -0,0 +1,118 @@
+# pripper/store.py
+import os
+import hashlib
+import sqlite3
+import threading
+
+from .files import index_allocator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size   INTEGER NOT NULL,
+    ext    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url    TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+"""
+
+class ContentStore:
+    """
+    Library-wide, content-addressed media store shared by any number of
+    target folders. Blobs live at objects/<ab>/<sha256>; a board's image_N
+    files are hardlinks to them (a plain copy where the filesystem can't
+    link), so media saved to ten boards is stored once. index.sqlite maps
+    each blob to its extension and every source URL to its blob, so a URL
+    fetched for one board is never downloaded again for another.
+
+    Board files must not be edited in place: a hardlink shares its bytes
+    with every other board holding the same media.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def lookup_url(self, url):
+        """(sha256, ext) of content already fetched from `url`, or None."""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT u.sha256, b.ext FROM urls u JOIN blobs b ON b.sha256 = u.sha256 WHERE u.url=?", (url,)
+            ).fetchone()
+        if row is not None and os.path.exists(self.blob_path(row[0])):
+            return row
+        return None
+
+    def put(self, data, ext, url=None, sha256=None):
+        """Store `data` (a no-op if the blob exists) and remember `url` for it. Returns the SHA-256."""
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self.db.execute("INSERT OR IGNORE INTO blobs (sha256, size, ext) VALUES (?, ?, ?)",
+                            (sha256, len(data), ext))
+            if url:
+                self.db.execute("INSERT OR REPLACE INTO urls (url, sha256) VALUES (?, ?)", (url, sha256))
+            self.db.commit()
+        return sha256
+
+    def link(self, sha256, target_dir, ext):
+        """Add the blob to `target_dir` as a fresh image_N{ext}; returns its path relative to the folder."""
+        return index_allocator(target_dir).link_new(self.blob_path(sha256), ext)
+
+    def gc(self):
+        """Delete blobs no board links to any more. Returns (blobs removed, bytes freed)."""
+        removed = freed = 0
+        with self._lock:
+            rows = self.db.execute("SELECT sha256 FROM blobs").fetchall()
+        gone = []
+        for (sha256,) in rows:
+            path = self.blob_path(sha256)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                gone.append(sha256)
+                continue
+            if st.st_nlink <= 1:
+                # boards that got a copy instead of a link keep their own bytes
+                os.remove(path)
+                gone.append(sha256)
+                removed += 1
+                freed += st.st_size
+        with self._lock:
+            self.db.executemany("DELETE FROM urls WHERE sha256=?", [(s,) for s in gone])
+            self.db.executemany("DELETE FROM blobs WHERE sha256=?", [(s,) for s in gone])
+            self.db.commit()
+        return removed, freed
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def open_store(root):
+    """Shared ContentStore for `root`, or None when no store is configured."""
+    if not root:
+        return None
+    key = os.path.abspath(os.path.expanduser(root))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ContentStore(key)
+        return store
@@ -1,10 +1,26 @@
 # pripper/utils.py
+import sys
 from colorama import init, Fore
 
 # Initialize colorama once
 init(autoreset=True)
 
-def print_info(msg):    print(Fore.CYAN   + '[*] ' + str(msg))
-def print_success(msg): print(Fore.GREEN  + '[+] ' + str(msg))
-def print_error(msg):   print(Fore.RED    + '[-] ' + str(msg))
-def print_warning(msg): print(Fore.YELLOW + '[!] ' + str(msg))
+# None = stdout; switched to stderr when stdout carries machine-readable output
+LOG_STREAM = None
+
+def log_to_stderr():
+    global LOG_STREAM
+    LOG_STREAM = sys.stderr
+
+# Set by pripper.progress: blanks its in-place status line before a log line
+_clear_status = None
+
+def _emit(line):
+    if _clear_status is not None:
+        _clear_status()
+    print(line, file=LOG_STREAM)
+
+def print_info(msg):    _emit(Fore.CYAN   + '[*] ' + str(msg))
+def print_success(msg): _emit(Fore.GREEN  + '[+] ' + str(msg))
+def print_error(msg):   _emit(Fore.RED    + '[-] ' + str(msg))
+def print_warning(msg): _emit(Fore.YELLOW + '[!] ' + str(msg))
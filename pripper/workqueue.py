@@ -0,0 +1,357 @@
+# pripper/workqueue.py
+import os
+import time
+import socket
+import sqlite3
+import concurrent.futures
+
+from .utils import print_info, print_success, print_warning, print_error
+from .config import MAX_WORKERS
+from . import metrics, progress
+
+LEASE_SECONDS = 300     # a claimed item returns to the pool if not completed in time
+MAX_ATTEMPTS  = 3
+IDLE_POLL     = 2.0     # worker sleep when nothing is claimable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id          INTEGER PRIMARY KEY,
+    kind        TEXT NOT NULL,              -- 'pin' | 'media'
+    target      TEXT NOT NULL,
+    key         TEXT NOT NULL,              -- canonical key (media) or url (pin)
+    url         TEXT NOT NULL,
+    pin_url     TEXT,
+    state       TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done | failed
+    owner       TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    UNIQUE (kind, target, key)
+);
+CREATE INDEX IF NOT EXISTS items_claim ON items (state, kind, lease_until);
+CREATE TABLE IF NOT EXISTS hashes (
+    target   TEXT NOT NULL,
+    sha256   TEXT NOT NULL,
+    item_id  INTEGER,                       -- NULL for files that predate the crawl
+    filename TEXT,
+    PRIMARY KEY (target, sha256)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    """
+    File-backed (SQLite) queue of pin/media URLs shared by a coordinator and
+    any number of worker processes. Claims are leases: an item whose owner
+    dies is handed out again once `lease_until` passes. The same database
+    holds the content-hash dedupe set, so it stays consistent across workers;
+    image_N numbering comes from each target's IndexAllocator. Use the
+    default rollback journal (not WAL) when the file lives on a network
+    filesystem.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _tx(self):
+        # BEGIN IMMEDIATE takes the write lock up front so claims never race
+        self.db.execute("BEGIN IMMEDIATE")
+
+    # ---- producer side ----
+    def enqueue_media(self, url, target, pin_url=None):
+        """Queue a media URL; an /originals/ URL upgrades a pending lower-res one with the same key."""
+        from .export import canonical_key
+        key = canonical_key(url)
+        self._tx()
+        try:
+            row = self.db.execute(
+                "SELECT id, url, state FROM items WHERE kind='media' AND target=? AND key=?", (target, key)
+            ).fetchone()
+            added = False
+            if row is None:
+                self.db.execute(
+                    "INSERT INTO items (kind, target, key, url, pin_url) VALUES ('media', ?, ?, ?, ?)",
+                    (target, key, url, pin_url),
+                )
+                added = True
+            elif row[2] == 'pending' and '/originals/' in url and '/originals/' not in row[1]:
+                self.db.execute("UPDATE items SET url=?, pin_url=COALESCE(?, pin_url) WHERE id=?",
+                                (url, pin_url, row[0]))
+            self.db.execute("COMMIT")
+            return added
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def enqueue_pin(self, pin_url, target):
+        cur = self.db.execute(
+            "INSERT OR IGNORE INTO items (kind, target, key, url) VALUES ('pin', ?, ?, ?)",
+            (target, pin_url, pin_url),
+        )
+        return cur.rowcount > 0
+
+    def seed_hashes(self, target, hashes):
+        """Register hashes of files already in `target` so workers skip them."""
+        self.db.executemany(
+            "INSERT OR IGNORE INTO hashes (target, sha256) VALUES (?, ?)", [(target, h) for h in hashes]
+        )
+
+    def set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name=?", (name,)).fetchone()
+        return row[0] if row else default
+
+    # ---- worker side ----
+    def claim(self, owner, kinds=("media", "pin"), limit=1, lease=LEASE_SECONDS):
+        """Lease up to `limit` claimable items. Returns list of (id, kind, target, url, pin_url)."""
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+        self._tx()
+        try:
+            rows = self.db.execute(
+                f"SELECT id, kind, target, url, pin_url FROM items "
+                f"WHERE kind IN ({marks}) AND attempts < ? "
+                f"AND (state='pending' OR (state='leased' AND lease_until < ?)) "
+                f"ORDER BY kind='pin', id LIMIT ?",
+                (*kinds, MAX_ATTEMPTS, now, limit),
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE items SET state='leased', owner=?, lease_until=?, attempts=attempts+1 WHERE id=?",
+                [(owner, now + lease, r[0]) for r in rows],
+            )
+            self.db.execute("COMMIT")
+            return rows
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def complete(self, item_id, owner, result="ok"):
+        self.db.execute(
+            "UPDATE items SET state='done', result=?, lease_until=NULL WHERE id=? AND owner=?",
+            (result, item_id, owner),
+        )
+
+    def fail(self, item_id, owner, error):
+        self.db.execute(
+            "UPDATE items SET state=CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "result=?, lease_until=NULL WHERE id=? AND owner=?",
+            (MAX_ATTEMPTS, str(error)[:500], item_id, owner),
+        )
+
+    def reserve_hash(self, target, sha256, item_id):
+        """True if this item may write this content (first claim, or a retry of the same item)."""
+        self.db.execute(
+            "INSERT OR IGNORE INTO hashes (target, sha256, item_id) VALUES (?, ?, ?)", (target, sha256, item_id)
+        )
+        row = self.db.execute(
+            "SELECT item_id, filename FROM hashes WHERE target=? AND sha256=?", (target, sha256)
+        ).fetchone()
+        return row is not None and row[0] == item_id and row[1] is None
+
+    def record_file(self, target, sha256, filename):
+        self.db.execute("UPDATE hashes SET filename=? WHERE target=? AND sha256=?", (filename, target, sha256))
+
+    def outstanding(self):
+        """Items still claimable or held under a live lease."""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM items WHERE (state='pending' AND attempts < ?) "
+            "OR (state='leased' AND (lease_until >= ? OR attempts < ?))",
+            (MAX_ATTEMPTS, time.time(), MAX_ATTEMPTS),
+        ).fetchone()[0]
+
+    def stats(self):
+        out = {}
+        for kind, state, n in self.db.execute("SELECT kind, state, COUNT(*) FROM items GROUP BY kind, state"):
+            out.setdefault(kind, {})[state] = n
+        return out
+
+# --------- Coordinator ----------
+def run_coordinator(queue_path, jobs, headless=True, fast=True):
+    """
+    Discover work for each job and put it in the queue:
+      - basic: media URLs found while scrolling
+      - advanced: the board's media URLs plus every pin page (resolved by workers)
+    """
+    from .browser import get_driver, scroll_page
+    from .files import hash_existing_files, enable_sharding
+    from .scrape import scroll_and_download_realtime, extract_image_urls_basic, extract_pin_links
+
+    q = WorkQueue(queue_path)
+    q.set_meta("coordinator_done", 0)
+    try:
+        for job in jobs:
+            target = os.path.abspath(job["target"])     # workers may run from another directory
+            os.makedirs(target, exist_ok=True)
+            if job.get("sharded"):
+                enable_sharding(target)
+            q.seed_hashes(target, hash_existing_files(target))
+            print_info(f"Coordinator: {job['mode']} {job['url']} -> {target}")
+            driver = get_driver(headless=headless, fast=fast)
+            try:
+                driver.get(job["url"])
+                time.sleep(2.0 if fast else 3.0)
+                if job["mode"] == "advanced":
+                    scroll_page(driver)
+                    media = sum(q.enqueue_media(u, target) for u in extract_image_urls_basic(driver))
+                    pins = sum(q.enqueue_pin(p, target) for p in extract_pin_links(driver))
+                    print_success(f"Queued {media} media and {pins} pins")
+                else:
+                    n = scroll_and_download_realtime(driver, target, exporter=_QueueSink(q, target))
+                    print_success(f"Queued {n} media")
+            except Exception as e:
+                print_error(f"Coordinator failed on {job['url']}: {e}")
+            finally:
+                driver.quit()
+    finally:
+        q.set_meta("coordinator_done", 1)
+        print_info(f"Queue state: {q.stats()}")
+        q.close()
+
+class _QueueSink:
+    """Exporter-compatible adapter so scrape code can feed the queue directly."""
+    def __init__(self, queue, target):
+        self.queue = queue
+        self.target = target
+
+    def emit(self, url, pin_url=None):
+        return self.queue.enqueue_media(url, self.target, pin_url=pin_url)
+
+# --------- Worker ----------
+def _process_media(q, owner, items, session, budget=None, prefilters=None, store=None, prog=None):
+    import hashlib
+    from .net import _fetch_bytes, _media_ext
+    from .files import index_allocator, typed_dir
+
+    def fetch(item):
+        if store is not None:
+            hit = store.lookup_url(item[3])
+            if hit is not None:
+                metrics.count("net.store_hit")
+                metrics.trace(item[3], "store_hit")
+                return item, None, None, "store_hit", hit    # already in the store: no fetch
+        if budget is not None:
+            with budget:
+                return (item, *_fetch_bytes(item[3], session, prefilters=prefilters), None)
+        return (item, *_fetch_bytes(item[3], session, prefilters=prefilters), None)
+
+    written = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(items))) as ex:
+        # sqlite connection stays on this thread; only the fetches are parallel
+        for (item_id, _, target, url, _), data, ctype, outcome, hit in ex.map(fetch, items):
+            try:
+                if hit is not None:
+                    h, ext = hit
+                elif not data:
+                    if outcome in ("prefilter_rejected", "too_small"):
+                        q.complete(item_id, owner, outcome)     # a refetch would get the same answer
+                    else:
+                        q.fail(item_id, owner, f"fetch failed ({outcome})")
+                    continue
+                else:
+                    h = hashlib.sha256(data).hexdigest()
+                    ext = _media_ext(data, ctype, url)
+                if not q.reserve_hash(target, h, item_id):
+                    q.complete(item_id, owner, "duplicate")
+                    metrics.count("net.duplicate")
+                    metrics.trace(url, "duplicate")
+                    continue
+                dest = typed_dir(target, ext)
+                os.makedirs(dest, exist_ok=True)
+                with metrics.timer("files.write"):
+                    if store is None:
+                        fname = index_allocator(dest).write_new(data, ext)
+                    else:
+                        if data is not None:
+                            store.put(data, ext, url=url, sha256=h)
+                        fname = store.link(h, dest, ext)
+                fname = os.path.relpath(os.path.join(dest, fname), target)
+                metrics.count("files.written")
+                if data:
+                    metrics.count("files.written_bytes", len(data))
+                metrics.trace(url, "written", file=fname)
+                metrics.link_file(os.path.join(target, fname), url)
+                q.record_file(target, h, fname)
+                q.complete(item_id, owner, fname)
+                progress.log(f"Downloaded: {fname}" + (f" ({len(data)} bytes)" if data else " (from store)")
+                             + f" <- {url}")
+                if prog is not None:
+                    prog.advance(1, len(data) if data else 0)
+                written += 1
+            except Exception as e:
+                q.fail(item_id, owner, e)
+    return written
+
+def _process_pin(q, owner, item, driver):
+    from .scrape import extract_image_from_pin_page, extract_video_from_pin_page
+    item_id, _, target, pin_url, _ = item
+    try:
+        found = 0
+        image_url = extract_image_from_pin_page(driver, pin_url)
+        if image_url:
+            q.enqueue_media(image_url, target, pin_url=pin_url)
+            found += 1
+        video_url = extract_video_from_pin_page(driver)
+        if video_url:
+            q.enqueue_media(video_url, target, pin_url=pin_url)
+            found += 1
+        q.complete(item_id, owner, f"{found} media")
+    except Exception as e:
+        q.fail(item_id, owner, e)
+
+def run_worker(queue_path, owner=None, batch=MAX_WORKERS, lease=LEASE_SECONDS, headless=True, fast=True,
+               budget=None, prefilters=None, store=None):
+    """
+    Claim and process items until the coordinator has finished and nothing
+    is left. Media items are fetched in batches; pin items open a browser
+    (started lazily, so media-only workers never launch Chrome).
+    """
+    from .net import _requests_session
+    from .store import open_store
+
+    owner = owner or default_owner()
+    store = open_store(store)
+    q = WorkQueue(queue_path)
+    session = _requests_session()
+    driver = None
+    written = 0
+    print_info(f"Worker {owner} attached to {queue_path}")
+    prog = progress.Progress("Writing")
+    try:
+        while True:
+            items = q.claim(owner, kinds=("media",), limit=batch, lease=lease)
+            if items:
+                written += _process_media(q, owner, items, session, budget=budget, prefilters=prefilters,
+                                          store=store, prog=prog)
+                continue
+            items = q.claim(owner, kinds=("pin",), limit=1, lease=lease)
+            if items:
+                if driver is None:
+                    from .browser import get_driver
+                    driver = get_driver(headless=headless, fast=fast)
+                _process_pin(q, owner, items[0], driver)
+                continue
+            if q.get_meta("coordinator_done") == "1" and q.outstanding() == 0:
+                break
+            time.sleep(IDLE_POLL)
+    except KeyboardInterrupt:
+        print_warning("Worker interrupted; leased items will be retried by others.")
+    finally:
+        prog.close()
+        if driver is not None:
+            driver.quit()
+        q.close()
+    print_success(f"Worker {owner} done: {written} files written.")
+    return written